@@ -0,0 +1,22 @@
+import asyncio
+import time
+
+from app.db.db import async_engine, init_db
+from app.db.rollups import backfill_rollups
+from app.models.user import User, DailyData  # noqa: F401
+from app.models.rollup import WeeklyRollup, MonthlyRollup  # noqa: F401
+
+
+async def main():
+    await init_db()
+
+    started = time.perf_counter()
+    async with async_engine.begin() as conn:
+        await conn.run_sync(backfill_rollups)
+    await async_engine.dispose()
+
+    print(f"Rollups rebuilt in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,20 @@
+import argparse
+
+from app.services.food_index import build_food_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local food index from an OpenFoodFacts dump")
+    parser.add_argument("dump", help="OpenFoodFacts CSV/TSV or JSONL dump, optionally .gz")
+    parser.add_argument("--output", default="food_index.db", help="Path of the index file")
+    args = parser.parse_args()
+
+    stats = build_food_index(args.dump, args.output)
+    print(
+        f"Indexed {stats['names']} names from {stats['records']} records "
+        f"in {stats['seconds']:.1f}s -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
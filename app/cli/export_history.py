@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import sys
+import time
+
+from app.db.db import engine, init_db
+from app.services.history_export import EXPORT_FORMATS, export_filename, export_history
+from app.settings.config import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream user history (profile and daily totals) to a file")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl")
+    parser.add_argument("--user-id", type=int, default=None, help="Export a single user instead of everyone")
+    parser.add_argument("--output", default=None, help="File path, '-' for stdout; defaults to a dated file name")
+    parser.add_argument("--chunk-size", type=int, default=config.export_chunk_size)
+    args = parser.parse_args()
+
+    asyncio.run(init_db())
+
+    output_path = args.output or export_filename(args.format, args.user_id)
+    started = time.perf_counter()
+    if output_path == "-":
+        rows = export_history(sys.stdout.buffer, args.format, args.user_id, args.chunk_size)
+        sys.stdout.flush()
+    else:
+        with open(output_path, "wb") as output:
+            rows = export_history(output, args.format, args.user_id, args.chunk_size)
+    engine.dispose()
+
+    print(f"Exported {rows} rows to {output_path} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
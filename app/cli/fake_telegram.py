@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter
+from typing import Any, Dict
+
+import aiohttp
+from aiohttp import web
+
+
+__all__ = ["FakeTelegramApi", "make_message_update"]
+
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+
+def _message(chat_id: int, text: str = "") -> Dict[str, Any]:
+    return {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": _user(chat_id),
+        "text": text
+    }
+
+
+def make_message_update(user_id: int, text: str) -> Dict[str, Any]:
+    return {"update_id": next(_update_ids), "message": _message(user_id, text)}
+
+
+def make_callback_update(user_id: int, data: str) -> Dict[str, Any]:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "message": _message(user_id, "menu"),
+            "data": data
+        }
+    }
+
+
+class FakeTelegramApi:
+    # Минимальная замена Bot API: отвечает на любой метод правдоподобным результатом
+    def __init__(self):
+        self.calls: Counter[str] = Counter()
+        self.app = web.Application(client_max_size=50 * 1024 * 1024)
+        self.app.router.add_route("POST", "/bot{token}/{method}", self.handle)
+        self.app.router.add_route("GET", "/bot{token}/{method}", self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+
+        if request.content_type == "multipart/form-data":
+            payload = {name: value for name, value in (await request.post()).items() if isinstance(value, str)}
+        elif request.can_read_body:
+            payload = dict(await request.post()) or {}
+        else:
+            payload = dict(request.query)
+
+        return web.json_response({"ok": True, "result": self.result(method, payload)})
+
+    @staticmethod
+    def result(method: str, payload: Dict[str, Any]) -> Any:
+        lowered = method.lower()
+        if lowered == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "fake_bot", "username": "fake_bot"}
+        if lowered.startswith("send") or lowered.startswith("edit"):
+            chat_id = int(payload.get("chat_id") or 0)
+            message = _message(chat_id, payload.get("text", ""))
+            if lowered == "sendphoto":
+                message["photo"] = [{
+                    "file_id": f"fake-photo-{message['message_id']}",
+                    "file_unique_id": str(message["message_id"]),
+                    "width": 640,
+                    "height": 480
+                }]
+            if lowered == "senddocument":
+                message["document"] = {
+                    "file_id": f"fake-document-{message['message_id']}",
+                    "file_unique_id": str(message["message_id"])
+                }
+            return message
+        if lowered == "getupdates":
+            return []
+        return True
+
+    async def start(self, host: str, port: int) -> web.AppRunner:
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        await web.TCPSite(runner, host=host, port=port).start()
+        return runner
+
+
+async def send_updates(webhook_url: str, secret: str | None, updates: int, users: int, concurrency: int):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    statuses: Counter[int] = Counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(updates):
+        user_id = 1_000_000 + i % users
+        queue.put_nowait(
+            make_message_update(user_id, "/start") if i % 2 == 0
+            else make_callback_update(user_id, "worker")
+        )
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        async def sender():
+            while not queue.empty():
+                update = queue.get_nowait()
+                async with session.post(webhook_url, json=update) as response:
+                    statuses[response.status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(sender() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(f"Sent {updates} updates in {elapsed:.2f}s ({updates / elapsed:.0f} upd/s), statuses: {dict(statuses)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline Telegram stand-in for webhook mode")
+    parser.add_argument("--webhook-url", default="http://127.0.0.1:8000/webhook")
+    parser.add_argument("--secret", default=None)
+    parser.add_argument("--api-host", default="127.0.0.1")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds to wait for bot replies")
+    args = parser.parse_args()
+
+    api = FakeTelegramApi()
+    runner = await api.start(args.api_host, args.api_port)
+    print(f"Fake Bot API on http://{args.api_host}:{args.api_port} (set TELEGRAM_API_URL to it)")
+    try:
+        await send_updates(args.webhook_url, args.secret, args.updates, args.users, args.concurrency)
+        await asyncio.sleep(args.settle)
+        print(f"Bot API calls received: {dict(api.calls)}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
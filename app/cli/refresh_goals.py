@@ -0,0 +1,30 @@
+import asyncio
+
+from app.db.db import init_db
+from app.services.goal_refresh import refresh_goals
+from app.services.http_client import http_client
+from app.settings.config import config
+
+
+async def main():
+    await init_db()
+    try:
+        stats = await refresh_goals(
+            chunk_size=config.goal_refresh_chunk_size,
+            concurrency=config.goal_refresh_concurrency
+        )
+    finally:
+        await http_client.close()
+
+    print(
+        f"Refreshed goals of {stats['users']} users in {stats['cities']} cities "
+        f"({stats['cities_without_weather']} without weather): {stats['changed']} changed, "
+        f"{stats['stale']} skipped as edited meanwhile, "
+        f"{stats['workers_notified']} workers notified, "
+        f"load {stats['load_seconds']:.1f}s, weather {stats['weather_seconds']:.1f}s, "
+        f"write {stats['write_seconds']:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.daily_data import DailyTotals
+from app.models.activity_event import ActivityEvent, CompactionWatermark
+from app.models.user import DailyData
+
+
+__all__ = [
+    "EVENT_WATER",
+    "EVENT_FOOD",
+    "EVENT_WORKOUT",
+    "DAILY_DATA_WATERMARK",
+    "append_event",
+    "get_watermark",
+    "advance_watermark",
+    "get_events_after",
+    "get_day_events",
+    "get_live_totals"
+]
+
+
+EVENT_WATER = "water"
+EVENT_FOOD = "food"
+EVENT_WORKOUT = "workout"
+
+DAILY_DATA_WATERMARK = "daily_data"
+
+
+def _day_range(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+async def append_event(
+    db: AsyncSession,
+    user_id: int,
+    kind: str,
+    ts: Optional[datetime] = None,
+    water: float = 0.0,
+    calories: float = 0.0,
+    burned: float = 0.0,
+    **details
+) -> int:
+    return (await db.execute(
+        insert(ActivityEvent).values(
+            user_id=user_id,
+            ts=ts or datetime.now(),
+            kind=kind,
+            water=water,
+            calories=calories,
+            burned=burned,
+            **details
+        ).returning(ActivityEvent.event_id)
+    )).scalar_one()
+
+
+async def get_watermark(db: AsyncSession, name: str = DAILY_DATA_WATERMARK) -> int:
+    return (await db.scalar(
+        select(CompactionWatermark.last_event_id).where(CompactionWatermark.name == name)
+    )) or 0
+
+
+async def advance_watermark(
+    db: AsyncSession,
+    previous: int,
+    last_event_id: int,
+    name: str = DAILY_DATA_WATERMARK
+) -> bool:
+    # Сдвигаем отметку, только если её никто не сдвинул после нашего чтения:
+    # иначе другой процесс уже свернул эти события и транзакцию надо откатить
+    result = await db.execute(
+        update(CompactionWatermark)
+        .where(CompactionWatermark.name == name, CompactionWatermark.last_event_id == previous)
+        .values(last_event_id=last_event_id)
+    )
+    return result.rowcount == 1
+
+
+async def get_events_after(db: AsyncSession, event_id: int, limit: int) -> List[Tuple]:
+    return (await db.execute(
+        select(
+            ActivityEvent.event_id,
+            ActivityEvent.user_id,
+            ActivityEvent.ts,
+            ActivityEvent.water,
+            ActivityEvent.calories,
+            ActivityEvent.burned
+        ).where(ActivityEvent.event_id > event_id).order_by(ActivityEvent.event_id).limit(limit)
+    )).all()
+
+
+async def get_day_events(db: AsyncSession, user_id: int, day: date) -> List[ActivityEvent]:
+    start, end = _day_range(day)
+    return list((await db.scalars(
+        select(ActivityEvent).where(
+            ActivityEvent.user_id == user_id,
+            ActivityEvent.ts >= start,
+            ActivityEvent.ts < end
+        ).order_by(ActivityEvent.ts, ActivityEvent.event_id)
+    )).all())
+
+
+async def get_live_totals(db: AsyncSession, user_id: int, day: Optional[date] = None) -> DailyTotals:
+    day = day or date.today()
+    start, end = _day_range(day)
+
+    # Свёрнутые суммы и ещё не свёрнутые события читаются одним запросом,
+    # чтобы компакция между двумя чтениями не учла события дважды
+    watermark = select(CompactionWatermark.last_event_id).where(
+        CompactionWatermark.name == DAILY_DATA_WATERMARK
+    ).scalar_subquery()
+    pending = select(
+        func.coalesce(func.sum(ActivityEvent.water), 0.0).label("water"),
+        func.coalesce(func.sum(ActivityEvent.calories), 0.0).label("calories"),
+        func.coalesce(func.sum(ActivityEvent.burned), 0.0).label("burned")
+    ).where(
+        ActivityEvent.user_id == user_id,
+        ActivityEvent.ts >= start,
+        ActivityEvent.ts < end,
+        ActivityEvent.event_id > func.coalesce(watermark, 0)
+    ).subquery()
+
+    row = (await db.execute(
+        select(
+            func.coalesce(DailyData.logged_water, 0.0) + pending.c.water,
+            func.coalesce(DailyData.logged_calories, 0.0) + pending.c.calories,
+            func.coalesce(DailyData.burned_calories, 0.0) + pending.c.burned
+        ).select_from(pending).outerjoin(
+            DailyData,
+            (DailyData.user_id == user_id) & (DailyData.date == day)
+        )
+    )).one()
+    return DailyTotals(*row)
@@ -0,0 +1,106 @@
+from datetime import date
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from sqlalchemy import String, func, select, type_coerce
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import DailyData
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+__all__ = ["DailyTotals", "DailyHistory", "increment_daily_data", "get_daily_totals", "get_daily_history"]
+
+
+class DailyTotals(NamedTuple):
+    logged_water: float
+    logged_calories: float
+    burned_calories: float
+
+
+class DailyHistory(NamedTuple):
+    dates: "np.ndarray"
+    water: "np.ndarray"
+    calories: "np.ndarray"
+    burned: "np.ndarray"
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+
+async def increment_daily_data(
+    db: AsyncSession,
+    user_id: int,
+    day: Optional[date] = None,
+    water: float = 0.0,
+    calories: float = 0.0,
+    burned: float = 0.0
+) -> DailyTotals:
+    stmt = insert(DailyData).values(
+        user_id=user_id,
+        date=day or date.today(),
+        logged_water=water,
+        logged_calories=calories,
+        burned_calories=burned
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyData.user_id, DailyData.date],
+        set_={
+            "logged_water": func.coalesce(DailyData.logged_water, 0) + stmt.excluded.logged_water,
+            "logged_calories": func.coalesce(DailyData.logged_calories, 0) + stmt.excluded.logged_calories,
+            "burned_calories": func.coalesce(DailyData.burned_calories, 0) + stmt.excluded.burned_calories
+        }
+    ).returning(
+        DailyData.logged_water,
+        DailyData.logged_calories,
+        DailyData.burned_calories
+    )
+    return DailyTotals(*(await db.execute(stmt)).one())
+
+
+async def get_daily_totals(db: AsyncSession, user_id: int, day: Optional[date] = None) -> Optional[DailyTotals]:
+    row = (await db.execute(
+        select(
+            func.coalesce(DailyData.logged_water, 0),
+            func.coalesce(DailyData.logged_calories, 0),
+            func.coalesce(DailyData.burned_calories, 0)
+        ).where(
+            DailyData.user_id == user_id,
+            DailyData.date == (day or date.today())
+        )
+    )).first()
+    return DailyTotals(*row) if row else None
+
+
+async def get_daily_history(db: AsyncSession, user_id: int, start: date, end: date) -> DailyHistory:
+    # numpy нужен только истории, поэтому не грузим его при старте бота
+    import numpy as np
+
+    # Кортежи из курсора сразу раскладываются по колонкам, без ORM-объектов;
+    # дата читается строкой, её разбирает numpy
+    rows = (await db.execute(
+        select(
+            type_coerce(DailyData.date, String),
+            func.coalesce(DailyData.logged_water, 0.0),
+            func.coalesce(DailyData.logged_calories, 0.0),
+            func.coalesce(DailyData.burned_calories, 0.0)
+        ).where(
+            DailyData.user_id == user_id,
+            DailyData.date >= start,
+            DailyData.date <= end
+        ).order_by(DailyData.date)
+    )).all()
+
+    if not rows:
+        empty = np.empty(0, dtype=np.float64)
+        return DailyHistory(np.empty(0, dtype="datetime64[D]"), empty, empty, empty)
+
+    dates, water, calories, burned = zip(*rows)
+    return DailyHistory(
+        np.array(dates, dtype="datetime64[D]"),
+        np.array(water, dtype=np.float64),
+        np.array(calories, dtype=np.float64),
+        np.array(burned, dtype=np.float64)
+    )
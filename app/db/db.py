@@ -1,9 +1,31 @@
-from contextlib import contextmanager
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, AsyncIterator
 
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
 
-SQLALCHEMY_DATABASE_URL = 'sqlite:///./fitness.db'
+from app.settings.config import config
+from app.utils.metrics import metrics
+
+
+__all__ = [
+    "Base",
+    "engine",
+    "async_engine",
+    "SessionLocal",
+    "AsyncSessionLocal",
+    "SyncSessionAdapter",
+    "get_db",
+    "get_async_db",
+    "init_db"
+]
+
+
+SQLALCHEMY_DATABASE_URL = f'sqlite:///{config.db_path}'
+SQLALCHEMY_ASYNC_DATABASE_URL = f'sqlite+aiosqlite:///{config.db_path}'
 
 
 engine = create_engine(
@@ -13,14 +35,102 @@ engine = create_engine(
     }
 )
 
+async_engine = create_async_engine(
+    url=SQLALCHEMY_ASYNC_DATABASE_URL
+)
+
+def _instrument(sync_engine: Engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "unknown"
+        metrics.observe("db_query_seconds", time.perf_counter() - started, operation=operation)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+
+def _configure_sqlite(sync_engine: Engine):
+    # Воркеры супервизора пишут в одну базу: WAL не блокирует читателей,
+    # а busy_timeout ждёт освобождения блокировки вместо ошибки "database is locked"
+    @event.listens_for(sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if config.db_wal:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                # В WAL синхронизация на каждом коммите не нужна для целостности,
+                # без неё дописывание событий в журнал остаётся дешёвым
+                cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(config.db_busy_timeout_ms)}")
+        finally:
+            cursor.close()
+
+
+_instrument(engine)
+_instrument(async_engine.sync_engine)
+_configure_sqlite(engine)
+_configure_sqlite(async_engine.sync_engine)
+
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
+    expire_on_commit=False,
     bind=engine
 )
 
+AsyncSessionLocal = async_sessionmaker(
+    autoflush=False,
+    expire_on_commit=False,
+    bind=async_engine
+)
+
 Base = declarative_base()
 
+
+class SyncSessionAdapter:
+    # Синхронная сессия с интерфейсом AsyncSession: запросы по-прежнему
+    # блокируют event loop, режим оставлен для сравнения под нагрузкой
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def execute(self, statement, params=None, **kwargs) -> Any:
+        return self.session.execute(statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs) -> Any:
+        return self.session.scalar(statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs) -> Any:
+        return self.session.scalars(statement, params, **kwargs)
+
+    async def get(self, entity, ident, **kwargs) -> Any:
+        return self.session.get(entity, ident, **kwargs)
+
+    def add(self, instance):
+        self.session.add(instance)
+
+    async def delete(self, instance):
+        self.session.delete(instance)
+
+    async def flush(self):
+        self.session.flush()
+
+    async def commit(self):
+        self.session.commit()
+
+    async def rollback(self):
+        self.session.rollback()
+
+    async def close(self):
+        self.session.close()
+
+
 @contextmanager
 def get_db():
     db = SessionLocal()
@@ -28,3 +138,37 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@asynccontextmanager
+async def get_async_db() -> AsyncIterator[AsyncSession | SyncSessionAdapter]:
+    if not config.db_async:
+        db = SyncSessionAdapter(SessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+        return
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _create_schema(conn):
+    # Таблицы попадают в metadata при импорте моделей: регистрируем все,
+    # иначе CLI без хендлеров создали бы схему частично и миграции упали бы
+    import app.models  # noqa: F401
+    from app.db.migrations import run_migrations
+
+    Base.metadata.create_all(bind=conn)
+    run_migrations(conn)
+
+
+async def init_db():
+    if not config.db_async:
+        with engine.begin() as conn:
+            _create_schema(conn)
+        return
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(_create_schema)
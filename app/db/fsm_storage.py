@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from app.db.db import get_async_db
+from app.models.fsm import FsmRecord
+from app.utils.ttl_cache import TTLCache
+
+
+__all__ = ["SQLiteStorage"]
+
+
+class _Record:
+    __slots__ = ("chat_id", "user_id", "state", "data")
+
+    def __init__(self, chat_id: int, user_id: int, state: Optional[str] = None, data: Optional[Dict] = None):
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.state = state
+        self.data = data or {}
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, flush_delay: float = 0.05, cache_size: int = 10000, cache_ttl: Optional[float] = 300.0):
+        self.flush_delay = flush_delay
+        self.key_builder = DefaultKeyBuilder(
+            with_bot_id=True,
+            with_business_connection_id=True,
+            with_destiny=True
+        )
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._dirty: Dict[str, _Record] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_records = 0
+
+    async def _record(self, key: StorageKey) -> _Record:
+        raw_key = self.key_builder.build(key)
+        record = self._dirty.get(raw_key)
+        if record is not None:
+            return record
+        return await self._cache.get_or_load(raw_key, lambda: self._load(raw_key, key))
+
+    async def _load(self, raw_key: str, key: StorageKey) -> _Record:
+        async with get_async_db() as db:
+            row = (await db.execute(
+                select(FsmRecord.state, FsmRecord.data).where(FsmRecord.key == raw_key)
+            )).first()
+
+        if row is None:
+            return _Record(key.chat_id, key.user_id)
+        return _Record(key.chat_id, key.user_id, row.state, json.loads(row.data))
+
+    async def _mark_dirty(self, key: StorageKey, record: _Record):
+        # Несколько update_data подряд в одном диалоге схлопываются в одну запись
+        raw_key = self.key_builder.build(key)
+        self._dirty[raw_key] = record
+        self._cache.set(raw_key, record)
+
+        if self.flush_delay <= 0:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        await self.flush()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+
+        batch, self._dirty = self._dirty, {}
+        now = time.time()
+        upserts = []
+        deletes = []
+        for raw_key, record in batch.items():
+            if record.state is None and not record.data:
+                deletes.append(raw_key)
+            else:
+                upserts.append({
+                    "key": raw_key,
+                    "chat_id": record.chat_id,
+                    "user_id": record.user_id,
+                    "state": record.state,
+                    "data": json.dumps(record.data, ensure_ascii=False),
+                    "updated_at": now
+                })
+
+        try:
+            async with get_async_db() as db:
+                if upserts:
+                    stmt = insert(FsmRecord)
+                    await db.execute(
+                        stmt.on_conflict_do_update(
+                            index_elements=[FsmRecord.key],
+                            set_={
+                                "state": stmt.excluded.state,
+                                "data": stmt.excluded.data,
+                                "updated_at": stmt.excluded.updated_at
+                            }
+                        ),
+                        upserts
+                    )
+                if deletes:
+                    await db.execute(delete(FsmRecord).where(FsmRecord.key.in_(deletes)))
+                await db.commit()
+        except Exception:
+            # Не теряем изменения: вернём их в очередь, если их не перезаписали
+            for raw_key, record in batch.items():
+                self._dirty.setdefault(raw_key, record)
+            raise
+
+        self.flushes += 1
+        self.flushed_records += len(batch)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        await self._mark_dirty(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = await self._record(key)
+        record.data = dict(data)
+        await self._mark_dirty(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict((await self._record(key)).data)
+
+    async def close(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            **self._cache.stats,
+            "dirty": len(self._dirty),
+            "flushes": self.flushes,
+            "flushed_records": self.flushed_records
+        }
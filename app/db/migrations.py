@@ -0,0 +1,107 @@
+from typing import Callable, List
+
+from sqlalchemy import Connection, text
+
+
+__all__ = ["MIGRATIONS", "run_migrations"]
+
+
+def _merge_duplicate_daily_data(conn: Connection):
+    # До уникального индекса за один день могло появиться несколько строк
+    conn.execute(text("""
+        UPDATE daily_data
+        SET logged_water = totals.logged_water,
+            logged_calories = totals.logged_calories,
+            burned_calories = totals.burned_calories
+        FROM (
+            SELECT MIN(daily_data_id) AS keep_id,
+                   SUM(COALESCE(logged_water, 0)) AS logged_water,
+                   SUM(COALESCE(logged_calories, 0)) AS logged_calories,
+                   SUM(COALESCE(burned_calories, 0)) AS burned_calories
+            FROM daily_data
+            GROUP BY user_id, date
+            HAVING COUNT(*) > 1
+        ) AS totals
+        WHERE daily_data.daily_data_id = totals.keep_id
+    """))
+    conn.execute(text("""
+        DELETE FROM daily_data
+        WHERE daily_data_id NOT IN (
+            SELECT MIN(daily_data_id) FROM daily_data GROUP BY user_id, date
+        )
+    """))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_data_user_date ON daily_data (user_id, date)"
+    ))
+
+
+def _add_daily_data_covering_index(conn: Connection):
+    # Выборки истории по (user_id, date) читаются из индекса без обращения к таблице
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_daily_data_user_date_cover "
+        "ON daily_data (user_id, date, logged_water, logged_calories, burned_calories)"
+    ))
+    conn.execute(text("ANALYZE daily_data"))
+
+
+def _ensure_daily_goal_flags(conn: Connection):
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(daily_data)"))}
+    for column in ("water_goal_met", "calorie_goal_met"):
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE daily_data ADD COLUMN {column} BOOLEAN"))
+
+
+def _backfill_rollups(conn: Connection):
+    # Роллапы дальше ведутся инкрементально, заполняем их по уже накопленной истории
+    from app.db.rollups import backfill_rollups
+
+    _ensure_daily_goal_flags(conn)
+    backfill_rollups(conn)
+
+
+def _add_user_activity(conn: Connection):
+    # Минуты активности нужны для ночного пересчёта норм, раньше они не сохранялись
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(users)"))}
+    if "activity" not in columns:
+        conn.execute(text("ALTER TABLE users ADD COLUMN activity INTEGER"))
+
+
+def _add_activity_event_watermark(conn: Connection):
+    from app.models.activity_event import CompactionWatermark
+
+    # Миграция не полагается на create_all: таблицу отметок создаём сами
+    CompactionWatermark.__table__.create(conn, checkfirst=True)
+    # Журнал событий начинается с нуля: прежняя история уже лежит в daily_data
+    conn.execute(text(
+        "INSERT OR IGNORE INTO compaction_watermarks (name, last_event_id) VALUES ('daily_data', 0)"
+    ))
+
+
+def _add_daily_goal_flags(conn: Connection):
+    # Счётчики дней с нормой в роллапах пересчитываются по флагам, сохранённым в каждом дне
+    _backfill_rollups(conn)
+
+
+def _drop_daily_data_covering_index(conn: Connection):
+    # Уникальный индекс по (user_id, date) уже находит дни истории, а второй индекс
+    # с теми же ведущими колонками удорожал каждую запись дня (см. bench_daily_history.py)
+    conn.execute(text("DROP INDEX IF EXISTS ix_daily_data_user_date_cover"))
+    conn.execute(text("ANALYZE daily_data"))
+
+
+MIGRATIONS: List[Callable[[Connection], None]] = [
+    _merge_duplicate_daily_data,
+    _add_daily_data_covering_index,
+    _backfill_rollups,
+    _add_user_activity,
+    _add_activity_event_watermark,
+    _add_daily_goal_flags,
+    _drop_daily_data_covering_index,
+]
+
+
+def run_migrations(conn: Connection):
+    version = conn.execute(text("PRAGMA user_version")).scalar()
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        migration(conn)
+        conn.execute(text(f"PRAGMA user_version = {number}"))
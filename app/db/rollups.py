@@ -0,0 +1,140 @@
+from datetime import date, timedelta
+from typing import List, Type
+
+from sqlalchemy import Connection, delete, select, text, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.daily_data import DailyTotals
+from app.models.rollup import WeeklyRollup, MonthlyRollup
+from app.models.user import DailyData
+
+
+__all__ = [
+    "ROLLUP_PERIODS",
+    "week_start",
+    "month_start",
+    "apply_rollup_delta",
+    "get_rollups",
+    "backfill_rollups"
+]
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+async def apply_rollup_delta(
+    db: AsyncSession,
+    user_id: int,
+    day: date,
+    before: DailyTotals,
+    after: DailyTotals,
+    water_goal: float,
+    calorie_goal: float
+):
+    # Норма может смениться посреди дня, поэтому выполнение хранится в самом дне:
+    # счётчик меняется на разницу с сохранённым флагом, и вклад дня всегда 0 или 1
+    day_filter = (DailyData.user_id == user_id, DailyData.date == day)
+    stored = (await db.execute(
+        select(DailyData.water_goal_met, DailyData.calorie_goal_met).where(*day_filter)
+    )).first()
+    was_water_met, was_calorie_met = (bool(stored[0]), bool(stored[1])) if stored else (False, False)
+    water_met = after.logged_water >= water_goal
+    calorie_met = after.logged_calories >= calorie_goal
+    if stored is None or stored[0] is None or (was_water_met, was_calorie_met) != (water_met, calorie_met):
+        await db.execute(
+            update(DailyData).where(*day_filter).values(water_goal_met=water_met, calorie_goal_met=calorie_met)
+        )
+
+    # В роллапы попадает только изменение дня: суммы растут на дельту,
+    # счётчик дней меняется, когда день впервые появился
+    values = {
+        "water_sum": after.logged_water - before.logged_water,
+        "calories_sum": after.logged_calories - before.logged_calories,
+        "burned_sum": after.burned_calories - before.burned_calories,
+        "days_logged": int(any(after)) - int(any(before)),
+        "water_goal_days": int(water_met) - int(was_water_met),
+        "calorie_goal_days": int(calorie_met) - int(was_calorie_met)
+    }
+
+    for model, period_start in ((WeeklyRollup, week_start(day)), (MonthlyRollup, month_start(day))):
+        stmt = insert(model).values(user_id=user_id, period_start=period_start, **values)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[model.user_id, model.period_start],
+            set_={name: getattr(model, name) + stmt.excluded[name] for name in values}
+        ))
+
+
+# Для квартала показываем недели, для полугодия и года - месяцы
+ROLLUP_PERIODS = {
+    3: WeeklyRollup,
+    6: MonthlyRollup,
+    12: MonthlyRollup
+}
+
+
+async def get_rollups(
+    db: AsyncSession,
+    model: Type[WeeklyRollup | MonthlyRollup],
+    user_id: int,
+    months: int
+) -> List[WeeklyRollup | MonthlyRollup]:
+    first = month_start(date.today())
+    for _ in range(months - 1):
+        first = month_start(first - timedelta(days=1))
+    if model is WeeklyRollup:
+        first = week_start(first)
+
+    return list((await db.scalars(
+        select(model).where(
+            model.user_id == user_id,
+            model.period_start >= first
+        ).order_by(model.period_start)
+    )).all())
+
+
+_BACKFILL_SQL = """
+INSERT INTO {table} (
+    user_id, period_start, water_sum, calories_sum, burned_sum,
+    days_logged, water_goal_days, calorie_goal_days
+)
+SELECT d.user_id,
+       {period} AS period_start,
+       SUM(COALESCE(d.logged_water, 0)),
+       SUM(COALESCE(d.logged_calories, 0)),
+       SUM(COALESCE(d.burned_calories, 0)),
+       SUM(COALESCE(d.logged_water, 0) + COALESCE(d.logged_calories, 0) + COALESCE(d.burned_calories, 0) > 0),
+       SUM(COALESCE(d.water_goal_met, 0)),
+       SUM(COALESCE(d.calorie_goal_met, 0))
+FROM daily_data AS d
+GROUP BY d.user_id, period_start
+"""
+
+# Дням без флага (записанным до их появления) выставляем его по текущей норме
+_FILL_GOAL_FLAGS_SQL = """
+UPDATE daily_data
+SET water_goal_met = COALESCE(daily_data.logged_water, 0) >= u.water_level,
+    calorie_goal_met = COALESCE(daily_data.logged_calories, 0) >= u.calorie_level
+FROM users AS u
+WHERE u.user_id = daily_data.user_id
+  AND (daily_data.water_goal_met IS NULL OR daily_data.calorie_goal_met IS NULL)
+"""
+
+
+def backfill_rollups(conn: Connection):
+    conn.execute(text(_FILL_GOAL_FLAGS_SQL))
+    conn.execute(delete(WeeklyRollup))
+    conn.execute(delete(MonthlyRollup))
+    conn.execute(text(_BACKFILL_SQL.format(
+        table=WeeklyRollup.__tablename__,
+        period="date(d.date, '-6 days', 'weekday 1')"
+    )))
+    conn.execute(text(_BACKFILL_SQL.format(
+        table=MonthlyRollup.__tablename__,
+        period="strftime('%Y-%m-01', d.date)"
+    )))
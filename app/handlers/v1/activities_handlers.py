@@ -1,16 +1,19 @@
-from datetime import date
+from datetime import date, timedelta
 
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from sqlalchemy.orm import Session
 
-from app.models.user import User, DailyData
-from app.db.db import get_db
+from app.db.db import get_async_db
+from app.db.activity_events import EVENT_WATER, EVENT_FOOD, EVENT_WORKOUT, get_day_events, get_live_totals
 from app.services.nutrition_cal_service import NutritionService
+from app.services.upstream_limits import UpstreamThrottled
 from app.services.workout_service import WorkoutService
+from app.services.activity_log import activity_logger
+from app.services.profile_cache import get_profile
+from app.models.activity_event import ActivityEvent
 
 
 router = Router()
@@ -24,26 +27,6 @@ class ActivitiesStates(StatesGroup):
     LOG_WORKOUT_DURATION = State()
 
 
-def get_daily_data(user_id: int, db: Session):
-    user = db.query(User).filter(User.user_id == user_id).first()
-    daily = db.query(DailyData).filter(
-        DailyData.user_id == user.user_id,
-        DailyData.date == date.today()
-    ).first()
-
-    if not daily:
-        daily = DailyData(
-            user_id=user.user_id,
-            date=date.today(),
-            logged_water=0,
-            logged_calories=0,
-            burned_calories=0
-        )
-        db.add(daily)
-        db.commit()
-    return daily
-
-
 @router.callback_query(F.data == "log_water")
 async def log_water(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("💧 Введите количество воды в мл:")
@@ -52,32 +35,29 @@ async def log_water(callback: CallbackQuery, state: FSMContext):
 
 @router.message(ActivitiesStates.LOG_WATER, F.text.regexp(r"^\d+$"))
 async def process_water(message: Message, state: FSMContext):
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == message.from_user.id).first()
+    user = await get_profile(message.from_user.id)
 
-        if not user:
-            return await message.answer("Сначала создайте профиль!")
+    if not user:
+        return await message.answer("Сначала создайте профиль!")
 
-        try:
-            amount = float(message.text)
-            daily = get_daily_data(message.from_user.id, db)
-            daily.logged_water += amount
-            db.commit()
+    try:
+        amount = float(message.text)
+        daily = await activity_logger.log(user, EVENT_WATER, water=amount)
 
-            remaining = user.water_level - daily.logged_water
-            await message.answer(
-                f"💧 Записано {amount} мл воды. Осталось: {remaining} мл",
-                reply_markup=InlineKeyboardBuilder()
-                .button(text="◀️ Назад", callback_data="worker")
-                .as_markup()
-            )
-        except:
-            await message.answer(
-                "Ошибка. Введите число.",
-                reply_markup=InlineKeyboardBuilder()
-                .button(text="◀️ Назад", callback_data="worker")
-                .as_markup()
-            )
+        remaining = user.water_level - daily.logged_water
+        await message.answer(
+            f"💧 Записано {amount} мл воды. Осталось: {remaining} мл",
+            reply_markup=InlineKeyboardBuilder()
+            .button(text="◀️ Назад", callback_data="worker")
+            .as_markup()
+        )
+    except ValueError:
+        await message.answer(
+            "Ошибка. Введите число.",
+            reply_markup=InlineKeyboardBuilder()
+            .button(text="◀️ Назад", callback_data="worker")
+            .as_markup()
+        )
     await state.clear()
 
 
@@ -116,6 +96,9 @@ async def process_food(message: Message, state: FSMContext):
                 .button(text="◀️ Назад", callback_data="worker")
                 .as_markup()
             )
+    except UpstreamThrottled:
+        # Ответ об исчерпанном лимите отправит RateLimitMiddleware
+        raise
     except Exception as e:
         await message.answer(
             f"Ошибка: {e}",
@@ -127,44 +110,43 @@ async def process_food(message: Message, state: FSMContext):
 
 @router.message(ActivitiesStates.LOG_FOOD_AMOUNT, F.text.regexp(r"^\d+$"))
 async def process_food_amount(message: Message, state: FSMContext):
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == message.from_user.id).first()
+    user = await get_profile(message.from_user.id)
 
-        if not user:
-            return await message.answer("Сначала создайте профиль!")
+    if not user:
+        return await message.answer("Сначала создайте профиль!")
 
-        data = await state.get_data()
-        nutrition_info = data.get("nutrition_info")
+    data = await state.get_data()
+    nutrition_info = data.get("nutrition_info")
 
-        if not nutrition_info:
-            return await message.answer(
-                "Ошибка: информация о продукте не найдена.",
-                reply_markup=InlineKeyboardBuilder()
-                .button(text="◀️ Назад", callback_data="worker")
-                .as_markup()
-            )
+    if not nutrition_info:
+        return await message.answer(
+            "Ошибка: информация о продукте не найдена.",
+            reply_markup=InlineKeyboardBuilder()
+            .button(text="◀️ Назад", callback_data="worker")
+            .as_markup()
+        )
 
-        try:
-            grams = int(message.text)
-            calories = grams * 0.01 * nutrition_info['calories']
+    try:
+        grams = int(message.text)
+        calories = grams * 0.01 * nutrition_info['calories']
 
-            daily = get_daily_data(message.from_user.id, db)
-            daily.logged_calories += calories
-            db.commit()
+        await activity_logger.log(
+            user, EVENT_FOOD, calories=calories, food_name=nutrition_info['name'], food_grams=grams
+        )
 
-            await message.answer(
-                f"🍽 Записано {grams}г. Добавлено {calories:.1f} ккал",
-                reply_markup=InlineKeyboardBuilder()
-                .button(text="◀️ Назад", callback_data="worker")
-                .as_markup()
-            )
-        except ValueError:
-            await message.answer(
-                "Пожалуйста, введите число.",
-                reply_markup=InlineKeyboardBuilder()
-                .button(text="◀️ Назад", callback_data="worker")
-                .as_markup()
-            )
+        await message.answer(
+            f"🍽 Записано {grams}г. Добавлено {calories:.1f} ккал",
+            reply_markup=InlineKeyboardBuilder()
+            .button(text="◀️ Назад", callback_data="worker")
+            .as_markup()
+        )
+    except ValueError:
+        await message.answer(
+            "Пожалуйста, введите число.",
+            reply_markup=InlineKeyboardBuilder()
+            .button(text="◀️ Назад", callback_data="worker")
+            .as_markup()
+        )
     await state.clear()
 
 
@@ -203,8 +185,13 @@ async def process_workout_duration(message: Message, state: FSMContext):
     data = await state.get_data()
     activity = data.get("activity")
 
+    user = await get_profile(message.from_user.id)
+
+    if not user:
+        return await message.answer("Сначала создайте профиль!")
+
     workout_service = WorkoutService()
-    calories_burned = workout_service.get_calories_burned(activity, duration)
+    calories_burned = await workout_service.get_calories_burned(activity, duration, user.weight)
 
     if not calories_burned:
         return await message.answer(
@@ -214,64 +201,104 @@ async def process_workout_duration(message: Message, state: FSMContext):
             .as_markup()
         )
 
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == message.from_user.id).first()
+    await activity_logger.log(
+        user,
+        EVENT_WORKOUT,
+        burned=calories_burned[0]['total_calories'],
+        workout_type=activity,
+        workout_minutes=duration
+    )
 
-        if not user:
-            return await message.answer("Сначала создайте профиль!")
+    water_to_drink = calculate_water_for_workout(duration)
 
-        daily = get_daily_data(message.from_user.id, db)
-        daily.burned_calories += calories_burned[0]['total_calories']
-        db.commit()
+    response_text = (
+        f"🏋️ Тренировка: {activity}\n"
+        f"⏱ Продолжительность: {duration} мин\n"
+        f"🔥 Сожжено калорий: {calories_burned[0]['total_calories']:.1f}\n"
+        f"💧 Рекомендуется выпить воды: {water_to_drink} мл"
+    )
 
-        water_to_drink = calculate_water_for_workout(duration)
+    await message.answer(
+        response_text,
+        reply_markup=InlineKeyboardBuilder()
+        .button(text="◀️ Назад", callback_data="worker")
+        .as_markup()
+    )
+    await state.clear()
 
-        response_text = (
-            f"🏋️ Тренировка: {activity}\n"
-            f"⏱ Продолжительность: {duration} мин\n"
-            f"🔥 Сожжено калорий: {calories_burned[0]['total_calories']:.1f}\n"
-            f"💧 Рекомендуется выпить воды: {water_to_drink} мл"
-        )
 
-        await message.answer(
-            response_text,
+@router.callback_query(F.data == "progress")
+async def show_progress(callback: CallbackQuery):
+    user = await get_profile(callback.from_user.id)
+
+    if not user:
+        return await callback.message.answer(
+            "Сначала создайте профиль!",
             reply_markup=InlineKeyboardBuilder()
             .button(text="◀️ Назад", callback_data="worker")
             .as_markup()
         )
-    await state.clear()
 
+    today = date.today()
+    async with get_async_db() as db:
+        daily = await get_live_totals(db, user.user_id, today)
 
-@router.callback_query(F.data == "progress")
-async def show_progress(callback: CallbackQuery):
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == callback.from_user.id).first()
+    water_status = "✅ Норма выполнена" if daily.logged_water >= user.water_level else "❌ Норма не выполнена"
+    calories_status = "✅ Норма выполнена" if daily.logged_calories >= user.calorie_level else "❌ Норма не выполнена"
+    burned_status = "✅ Норма выполнена" if daily.burned_calories >= user.calorie_level else "❌ Норма не выполнена"
 
-        if not user:
-            return await callback.message.answer(
-                "Сначала создайте профиль!",
-                reply_markup=InlineKeyboardBuilder()
-                .button(text="◀️ Назад", callback_data="worker")
-                .as_markup()
-            )
+    progress_text = (
+        f"📅 Прогресс за {today}:\n\n"
+        f"💧 Вода: {daily.logged_water}/{user.water_level} мл {water_status}\n"
+        f"🍎 Калории: {daily.logged_calories:.1f}/{user.calorie_level} ккал {calories_status}\n"
+        f"🔥 Сожжено: {daily.burned_calories} ккал {burned_status}"
+    )
+
+    builder = InlineKeyboardBuilder()
+    builder.button(text="📋 Записи за день", callback_data="day_events")
+    builder.button(text="◀️ Назад", callback_data="worker")
+    builder.adjust(1)
+
+    await callback.message.edit_text(
+        progress_text,
+        reply_markup=builder.as_markup()
+    )
 
-        daily = get_daily_data(callback.from_user.id, db)
+DAY_EVENTS_LIMIT = 50
 
-        water_status = "✅ Норма выполнена" if daily.logged_water >= user.water_level else "❌ Норма не выполнена"
-        calories_status = "✅ Норма выполнена" if daily.logged_calories >= user.calorie_level else "❌ Норма не выполнена"
-        burned_status = "✅ Норма выполнена" if daily.burned_calories >= user.calorie_level else "❌ Норма не выполнена"
 
-        progress_text = (
-            f"📅 Прогресс за {daily.date}:\n\n"
-            f"💧 Вода: {daily.logged_water}/{user.water_level} мл {water_status}\n"
-            f"🍎 Калории: {daily.logged_calories:.1f}/{user.calorie_level} ккал {calories_status}\n"
-            f"🔥 Сожжено: {daily.burned_calories} ккал {burned_status}"
-        )
+def format_activity_event(event: ActivityEvent) -> str:
+    if event.kind == EVENT_WATER:
+        return f"{event.ts:%H:%M} 💧 Вода: {event.water:.0f} мл"
+    if event.kind == EVENT_FOOD:
+        return f"{event.ts:%H:%M} 🍎 {event.food_name}: {event.food_grams:.0f} г, {event.calories:.1f} ккал"
+    return (
+        f"{event.ts:%H:%M} 🏋️ {event.workout_type}: {event.workout_minutes} мин, "
+        f"сожжено {event.burned:.1f} ккал"
+    )
+
+
+@router.callback_query(F.data.startswith("day_events"))
+async def show_day_events(callback: CallbackQuery):
+    _, _, day_text = callback.data.partition(":")
+    day = date.fromisoformat(day_text) if day_text else date.today()
+
+    async with get_async_db() as db:
+        events = await get_day_events(db, callback.from_user.id, day)
+
+    if events:
+        lines = [format_activity_event(event) for event in events[-DAY_EVENTS_LIMIT:]]
+        if len(events) > DAY_EVENTS_LIMIT:
+            lines.insert(0, f"… ещё {len(events) - DAY_EVENTS_LIMIT} записей раньше")
+        text = f"📋 Записи за {day}:\n\n" + "\n".join(lines)
+    else:
+        text = f"📋 За {day} записей нет."
 
-        builder = InlineKeyboardBuilder()
-        builder.button(text="◀️ Назад", callback_data="worker")
+    builder = InlineKeyboardBuilder()
+    builder.button(text="⬅️ Предыдущий день", callback_data=f"day_events:{day - timedelta(days=1)}")
+    if day < date.today():
+        builder.button(text="Следующий день ➡️", callback_data=f"day_events:{day + timedelta(days=1)}")
+    builder.button(text="◀️ Назад", callback_data="progress")
+    builder.adjust(2 if day < date.today() else 1, 1)
 
-        await callback.message.edit_text(
-            progress_text,
-            reply_markup=builder.as_markup()
-        )
\ No newline at end of file
+    await callback.message.edit_text(text, reply_markup=builder.as_markup())
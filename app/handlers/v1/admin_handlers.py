@@ -0,0 +1,55 @@
+from aiogram import Router, F
+from aiogram.types import Message
+from aiogram.filters import Command
+
+from app.settings.config import config
+from app.utils.metrics import metrics
+
+
+router = Router()
+router.message.filter(F.from_user.id.in_(set(config.admin_ids)))
+
+
+def format_latencies(name: str, label: str) -> list[str]:
+    lines = []
+    series = sorted(metrics.histograms(name).items(), key=lambda item: -item[1].sum)
+    for key, histogram in series:
+        title = dict(key).get(label, "?")
+        lines.append(
+            f"• {title}: {histogram.count} шт., "
+            f"сред. {histogram.sum / histogram.count * 1000:.0f} мс, "
+            f"p95 ≤ {histogram.quantile(0.95) * 1000:.0f} мс"
+        )
+    return lines or ["• нет данных"]
+
+
+@router.message(Command("stats"))
+async def stats(message: Message):
+    samples = metrics.collect()
+    hit_rates = [
+        f"• {labels['cache']}: {value:.0%}"
+        for name, labels, value in samples if name == "cache_hit_rate"
+    ]
+    gauges = {name: value for name, labels, value in samples if not labels}
+
+    text = "\n".join([
+        "📈 Обработчики:",
+        *format_latencies("bot_handler_seconds", "handler"),
+        "",
+        "🌐 Внешние сервисы:",
+        *format_latencies("upstream_request_seconds", "upstream"),
+        "",
+        "🗄 База данных:",
+        *format_latencies("db_query_seconds", "operation"),
+        "",
+        "📊 Графики:",
+        *format_latencies("chart_render_seconds", "kind"),
+        "",
+        "💾 Попадания в кэш:",
+        *(hit_rates or ["• нет данных"]),
+        "",
+        f"⏳ В обработке: {gauges.get('bot_updates_in_flight', 0):.0f} апдейтов, "
+        f"{gauges.get('chart_render_pending', 0):.0f} графиков, "
+        f"{gauges.get('activity_log_pending_events', 0):.0f} записей в буфере",
+    ])
+    await message.answer(text)
@@ -1,16 +1,29 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, BufferedInputFile
-from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, BufferedInputFile, FSInputFile
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import io
+from sqlalchemy import select
+import asyncio
+import os
+import tempfile
 
 from app.models.user import User, DailyData
-from app.db.db import get_db
+from app.db.db import get_async_db
+from app.db.daily_data import get_daily_history
+from app.db.rollups import ROLLUP_PERIODS, get_rollups
+from app.models.rollup import WeeklyRollup
+from app.services.achievements import get_user_achievements, get_user_streaks
 from app.services.weather_service import WeatherService
+from app.services.chart_service import chart_service, ChartBusyError
+from app.services.chart_cache import chart_cache
+from app.services.activity_log import activity_logger
+from app.services.profile_cache import get_profile, invalidate_profile
+from app.services.goals import calculate_water_goal, calculate_calorie_goal
+from app.services.history_export import EXPORT_FORMATS, export_filename, export_history
+from app.settings.config import config
 
 
 router = Router()
@@ -48,22 +61,21 @@ def get_main_menu_keyboard(user_exists: bool) -> InlineKeyboardBuilder:
 
 
 async def show_main_menu(callback_or_message: CallbackQuery | Message):
-    with get_db() as db:
-        user_id = (
-            callback_or_message.from_user.id
-            if isinstance(callback_or_message, CallbackQuery)
-            else callback_or_message.from_user.id
-        )
-        user = db.query(User).filter(User.user_id == user_id).first()
-        user_exists = user is not None
+    user_id = (
+        callback_or_message.from_user.id
+        if isinstance(callback_or_message, CallbackQuery)
+        else callback_or_message.from_user.id
+    )
+    user = await get_profile(user_id)
+    user_exists = user is not None
 
-        builder = get_main_menu_keyboard(user_exists)
-        text = "🏋️ Добро пожаловать в FitnessBot!\n\nВыберите действие снизу:"
+    builder = get_main_menu_keyboard(user_exists)
+    text = "🏋️ Добро пожаловать в FitnessBot!\n\nВыберите действие снизу:"
 
-        if isinstance(callback_or_message, CallbackQuery):
-            await callback_or_message.message.edit_text(text, reply_markup=builder.as_markup())
-        else:
-            await callback_or_message.answer(text, reply_markup=builder.as_markup())
+    if isinstance(callback_or_message, CallbackQuery):
+        await callback_or_message.message.edit_text(text, reply_markup=builder.as_markup())
+    else:
+        await callback_or_message.answer(text, reply_markup=builder.as_markup())
 
 
 async def show_menu_with_back_button(
@@ -81,6 +93,30 @@ async def start(message: Message):
     await show_main_menu(message)
 
 
+@router.message(Command("export"))
+async def export(message: Message, command: CommandObject):
+    fmt = (command.args or "csv").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        return await message.answer("Формат выгрузки: /export csv или /export jsonl")
+
+    user = await get_profile(message.from_user.id)
+    if not user:
+        return await message.answer("Сначала создайте профиль!")
+
+    await activity_logger.flush_user(user.user_id)
+
+    # История пишется в файл пачками и отправляется с диска, целиком в памяти не собирается
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, export_filename(fmt, user.user_id))
+
+        def write() -> int:
+            with open(path, "wb") as output:
+                return export_history(output, fmt, user.user_id, config.export_chunk_size)
+
+        await asyncio.to_thread(write)
+        await message.answer_document(FSInputFile(path), caption="📦 Ваша история")
+
+
 @router.callback_query(F.data == "set_profile")
 async def set_profile(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("Введите ваш вес в кг:")
@@ -130,12 +166,12 @@ async def process_activity(message: Message, state: FSMContext):
 @router.message(ProfileStates.CITY)
 async def process_city(message: Message, state: FSMContext):
     data = await state.get_data()
-    weather = WeatherService().get_temperature(message.text)
+    weather = await WeatherService().get_temperature(message.text)
 
-    valid_fields = {"weight", "height", "age", "gender"}
+    valid_fields = {"weight", "height", "age", "activity"}
     filtered_data = {k: v for k, v in data.items() if k in valid_fields}
 
-    with get_db() as db:
+    async with get_async_db() as db:
         user = User(
             user_id=message.from_user.id,
             **filtered_data,
@@ -144,7 +180,8 @@ async def process_city(message: Message, state: FSMContext):
             calorie_level=calculate_calorie_goal(data)
         )
         db.add(user)
-        db.commit()
+        await db.commit()
+        invalidate_profile(user.user_id)
 
         await message.answer(
             f"✅ Профиль создан!\n\n"
@@ -183,30 +220,30 @@ async def edit_weight(callback: CallbackQuery, state: FSMContext):
 
 @router.message(EditProfileStates.WEIGHT)
 async def process_edit_weight(message: Message, state: FSMContext):
-    data = await state.get_data()
-
     if not message.text.isdigit():
         return await message.answer("Введите число!")
 
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == message.from_user.id).first()
+    async with get_async_db() as db:
+        user = await db.get(User, message.from_user.id)
 
         if not user:
             return await message.answer("❌ Профиль не найден. Сначала создайте профиль.")
 
-        weather = WeatherService().get_temperature(user.city)
+        weather = await WeatherService().get_temperature(user.city)
 
         user.weight = float(message.text)
         user.water_level = calculate_water_goal({
             "weight": user.weight,
-            "activity": data.get("activity", 0)
+            "activity": user.activity or 0
         }, weather)
         user.calorie_level = calculate_calorie_goal({
             "weight": user.weight,
             "height": user.height,
             "age": user.age
         })
-        db.commit()
+        await db.commit()
+        chart_cache.bump_version(user.user_id)
+        invalidate_profile(user.user_id)
 
         updated_text = (
             f"✅ Вес успешно изменён!\n\n"
@@ -229,30 +266,30 @@ async def edit_height(callback: CallbackQuery, state: FSMContext):
 
 @router.message(EditProfileStates.HEIGHT)
 async def process_edit_height(message: Message, state: FSMContext):
-    data = await state.get_data()
-
     if not message.text.isdigit():
         return await message.answer("Введите число!")
 
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == message.from_user.id).first()
+    async with get_async_db() as db:
+        user = await db.get(User, message.from_user.id)
 
         if not user:
             return await message.answer("❌ Профиль не найден. Сначала создайте профиль.")
 
-        weather = WeatherService().get_temperature(user.city)
+        weather = await WeatherService().get_temperature(user.city)
 
         user.height = float(message.text)
         user.water_level = calculate_water_goal({
             "weight": user.weight,
-            "activity": data.get("activity", 0)
+            "activity": user.activity or 0
         }, weather)
         user.calorie_level = calculate_calorie_goal({
             "weight": user.weight,
             "height": user.height,
             "age": user.age
         })
-        db.commit()
+        await db.commit()
+        chart_cache.bump_version(user.user_id)
+        invalidate_profile(user.user_id)
 
         updated_text = (
             f"✅ Рост успешно изменён!\n\n"
@@ -275,30 +312,30 @@ async def edit_age(callback: CallbackQuery, state: FSMContext):
 
 @router.message(EditProfileStates.AGE)
 async def process_edit_age(message: Message, state: FSMContext):
-    data = await state.get_data()
-
     if not message.text.isdigit():
         return await message.answer("Введите число!")
 
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == message.from_user.id).first()
+    async with get_async_db() as db:
+        user = await db.get(User, message.from_user.id)
 
         if not user:
             return await message.answer("❌ Профиль не найден. Сначала создайте профиль.")
 
-        weather = WeatherService().get_temperature(user.city)
+        weather = await WeatherService().get_temperature(user.city)
 
         user.age = int(message.text)
         user.water_level = calculate_water_goal({
             "weight": user.weight,
-            "activity": data.get("activity", 0)
+            "activity": user.activity or 0
         }, weather)
         user.calorie_level = calculate_calorie_goal({
             "weight": user.weight,
             "height": user.height,
             "age": user.age
         })
-        db.commit()
+        await db.commit()
+        chart_cache.bump_version(user.user_id)
+        invalidate_profile(user.user_id)
 
         updated_text = (
             f"✅ Возраст успешно изменён!\n\n"
@@ -324,25 +361,27 @@ async def process_edit_activity(message: Message, state: FSMContext):
     if not message.text.isdigit():
         return await message.answer("Введите число!")
 
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == message.from_user.id).first()
+    async with get_async_db() as db:
+        user = await db.get(User, message.from_user.id)
 
         if not user:
             return await message.answer("❌ Профиль не найден. Сначала создайте профиль.")
 
-        weather = WeatherService().get_temperature(user.city)
+        weather = await WeatherService().get_temperature(user.city)
 
-        activity = int(message.text)
+        user.activity = int(message.text)
         user.water_level = calculate_water_goal({
             "weight": user.weight,
-            "activity": activity
+            "activity": user.activity
         }, weather)
         user.calorie_level = calculate_calorie_goal({
             "weight": user.weight,
             "height": user.height,
             "age": user.age
         })
-        db.commit()
+        await db.commit()
+        chart_cache.bump_version(user.user_id)
+        invalidate_profile(user.user_id)
 
         updated_text = (
             f"✅ Активность успешно изменена!\n\n"
@@ -365,30 +404,30 @@ async def edit_city(callback: CallbackQuery, state: FSMContext):
 
 @router.message(EditProfileStates.CITY)
 async def process_edit_city(message: Message, state: FSMContext):
-    data = await state.get_data()
-
     if not message.text.strip():
         return await message.answer("Введите название города!")
 
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == message.from_user.id).first()
+    async with get_async_db() as db:
+        user = await db.get(User, message.from_user.id)
 
         if not user:
             return await message.answer("❌ Профиль не найден. Сначала создайте профиль.")
 
-        weather = WeatherService().get_temperature(message.text)
+        weather = await WeatherService().get_temperature(message.text)
 
         user.city = message.text
         user.water_level = calculate_water_goal({
             "weight": user.weight,
-            "activity": data.get("activity", 0)
+            "activity": user.activity or 0
         }, weather)
         user.calorie_level = calculate_calorie_goal({
             "weight": user.weight,
             "height": user.height,
             "age": user.age
         })
-        db.commit()
+        await db.commit()
+        chart_cache.bump_version(user.user_id)
+        invalidate_profile(user.user_id)
 
         updated_text = (
             f"✅ Город успешно изменён!\n\n"
@@ -412,8 +451,11 @@ async def statistics(callback: CallbackQuery):
     builder.button(text="📈 График за день", callback_data="daily_progress_graph")
     builder.button(text="📊 График за месяц", callback_data="monthly_progress_graph")
     builder.button(text="🏆 Ачивки", callback_data="achievements")
+    builder.button(text="📆 3 месяца", callback_data="rollup_statistics_3")
+    builder.button(text="📆 6 месяцев", callback_data="rollup_statistics_6")
+    builder.button(text="📆 12 месяцев", callback_data="rollup_statistics_12")
     builder.button(text="◀️ Назад", callback_data="start")
-    builder.adjust(2, 2, 1)
+    builder.adjust(2, 2, 3, 1)
 
     await callback.message.answer(
         "Выберите тип статистики:",
@@ -423,10 +465,11 @@ async def statistics(callback: CallbackQuery):
 
 @router.callback_query(F.data == "daily_statistics")
 async def daily_statistics(callback: CallbackQuery):
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == callback.from_user.id).first()
+    async with get_async_db() as db:
+        user = await get_profile(callback.from_user.id)
         if user:
-            daily_data = db.query(DailyData).filter(DailyData.user_id == user.user_id, DailyData.date == datetime.today().date()).first()
+            await activity_logger.flush_user(user.user_id)
+            daily_data = await db.scalar(select(DailyData).where(DailyData.user_id == user.user_id, DailyData.date == datetime.today().date()))
             if daily_data:
                 text = (
                     f"📅 Статистика за день:\n\n"
@@ -442,40 +485,54 @@ async def daily_statistics(callback: CallbackQuery):
     await show_menu_with_back_button(callback, text)
 
 
+async def answer_chart(
+    callback: CallbackQuery,
+    cache_key: tuple,
+    photo: str | BufferedInputFile,
+    caption: str
+):
+    await callback.message.delete()
+
+    builder = InlineKeyboardBuilder()
+    builder.button(text="◀️ Назад", callback_data="statistics")
+    sent = await callback.message.answer_photo(
+        photo,
+        caption=caption,
+        reply_markup=builder.as_markup()
+    )
+    if sent.photo:
+        chart_cache.set_file_id(cache_key, sent.photo[-1].file_id)
+
+
 @router.callback_query(F.data == "daily_progress_graph")
 async def daily_progress_graph(callback: CallbackQuery):
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == callback.from_user.id).first()
+    today = datetime.today().date()
+    cache_key = chart_cache.key(callback.from_user.id, "daily", today, today)
+    caption = "📈 График прогресса за день:"
+
+    cached = chart_cache.get(cache_key)
+    if cached:
+        photo = cached.file_id or BufferedInputFile(cached.png, filename="progress.png")
+        return await answer_chart(callback, cache_key, photo, caption)
+
+    async with get_async_db() as db:
+        user = await get_profile(callback.from_user.id)
         if user:
-            daily_data = db.query(DailyData).filter(DailyData.user_id == user.user_id, DailyData.date == datetime.today().date()).first()
+            await activity_logger.flush_user(user.user_id)
+            daily_data = await db.scalar(select(DailyData).where(DailyData.user_id == user.user_id, DailyData.date == today))
             if daily_data:
-                await callback.message.delete()
-
                 labels = ["Вода", "Калории", "Сожжено"]
                 values = [daily_data.logged_water, daily_data.logged_calories, daily_data.burned_calories]
                 goals = [user.water_level, user.calorie_level, 0]
 
-                fig, ax = plt.subplots()
-                ax.bar(labels, values, label="Факт")
-                ax.bar(labels, goals, alpha=0.5, label="Цель")
-                ax.set_ylabel("Значение")
-                ax.set_title("Прогресс за день")
-                ax.legend()
-
-                buf = io.BytesIO()
-                plt.savefig(buf, format='png')
-                buf.seek(0)
-                plt.close()
+                try:
+                    png = await chart_service.render_daily(labels, values, goals)
+                except (ChartBusyError, asyncio.TimeoutError):
+                    return await callback.answer("⏳ Сервер перегружен, попробуйте построить график позже.")
 
-                photo = BufferedInputFile(buf.getvalue(), filename="progress.png")
-
-                builder = InlineKeyboardBuilder()
-                builder.button(text="◀️ Назад", callback_data="statistics")
-                await callback.message.answer_photo(
-                    photo,
-                    caption="📈 График прогресса за день:",
-                    reply_markup=builder.as_markup()
-                )
+                chart_cache.put(cache_key, png)
+                photo = BufferedInputFile(png, filename="progress.png")
+                await answer_chart(callback, cache_key, photo, caption)
             else:
                 await callback.message.answer("📅 Данные за сегодня отсутствуют.")
                 builder = InlineKeyboardBuilder()
@@ -489,62 +546,108 @@ async def daily_progress_graph(callback: CallbackQuery):
 
 @router.callback_query(F.data == "monthly_progress_graph")
 async def monthly_progress_graph(callback: CallbackQuery):
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == callback.from_user.id).first()
+    end_date = datetime.today().date()
+    start_date = end_date - timedelta(days=30)
+    cache_key = chart_cache.key(callback.from_user.id, "monthly", start_date, end_date)
+    caption = "📊 График прогресса за месяц:"
+
+    cached = chart_cache.get(cache_key)
+    if cached:
+        photo = cached.file_id or BufferedInputFile(cached.png, filename="monthly_progress.png")
+        return await answer_chart(callback, cache_key, photo, caption)
+
+    async with get_async_db() as db:
+        user = await get_profile(callback.from_user.id)
         if user:
-            end_date = datetime.today().date()
-            start_date = end_date - timedelta(days=30)
-            daily_data = db.query(DailyData).filter(DailyData.user_id == user.user_id, DailyData.date >= start_date, DailyData.date <= end_date).all()
-
-            if daily_data:
-                await callback.message.delete()
-
-                dates = [data.date for data in daily_data]
-                water = [data.logged_water for data in daily_data]
-                calories = [data.logged_calories for data in daily_data]
-                burned = [data.burned_calories for data in daily_data]
-
-                fig, ax = plt.subplots()
-                ax.plot(dates, water, label="Вода")
-                ax.plot(dates, calories, label="Калории")
-                ax.plot(dates, burned, label="Сожжено")
-                ax.set_ylabel("Значение")
-                ax.set_title("Прогресс за месяц")
-                ax.legend()
-
-                buf = io.BytesIO()
-                plt.savefig(buf, format='png')
-                buf.seek(0)
-                plt.close()
-
-                photo = BufferedInputFile(buf.getvalue(), filename="monthly_progress.png")
-
-                builder = InlineKeyboardBuilder()
-                builder.button(text="◀️ Назад", callback_data="statistics")
-                await callback.message.answer_photo(
-                    photo,
-                    caption="📊 График прогресса за месяц:",
-                    reply_markup=builder.as_markup()
-                )
+            await activity_logger.flush_user(user.user_id)
+            history = await get_daily_history(db, user.user_id, start_date, end_date)
+
+            if len(history):
+                try:
+                    png = await chart_service.render_monthly(
+                        history.dates.tolist(),
+                        history.water.tolist(),
+                        history.calories.tolist(),
+                        history.burned.tolist()
+                    )
+                except (ChartBusyError, asyncio.TimeoutError):
+                    return await callback.answer("⏳ Сервер перегружен, попробуйте построить график позже.")
+
+                chart_cache.put(cache_key, png)
+                photo = BufferedInputFile(png, filename="monthly_progress.png")
+                await answer_chart(callback, cache_key, photo, caption)
             else:
                 await callback.message.answer("📅 Данные за последний месяц отсутствуют.")
         else:
             await callback.message.answer("❌ Профиль не найден. Сначала создайте профиль.")
 
 
+@router.callback_query(F.data.startswith("rollup_statistics_"))
+async def rollup_statistics(callback: CallbackQuery):
+    months = int(callback.data.removeprefix("rollup_statistics_"))
+    model = ROLLUP_PERIODS.get(months)
+    if model is None:
+        return await callback.answer()
+
+    user = await get_profile(callback.from_user.id)
+    if not user:
+        return await show_menu_with_back_button(callback, "❌ Профиль не найден. Сначала создайте профиль.", "statistics")
+
+    await activity_logger.flush_user(user.user_id)
+    async with get_async_db() as db:
+        rollups = await get_rollups(db, model, user.user_id, months)
+
+    if not rollups:
+        text = f"📆 Статистика за {months} мес.:\n\nДанные за этот период отсутствуют."
+        return await show_menu_with_back_button(callback, text, "statistics")
+
+    weekly = model is WeeklyRollup
+    lines = []
+    for rollup in rollups:
+        days = rollup.days_logged or 1
+        period = f"Неделя с {rollup.period_start:%d.%m}" if weekly else f"{rollup.period_start:%m.%Y}"
+        lines.append(
+            f"{period}: 💧 {rollup.water_sum / days:.0f} мл/день, "
+            f"🍎 {rollup.calories_sum / days:.0f} ккал/день, "
+            f"🔥 {rollup.burned_sum:.0f} ккал, "
+            f"🎯 {rollup.water_goal_days}/{rollup.calorie_goal_days} из {rollup.days_logged} дн."
+        )
+
+    days_logged = sum(rollup.days_logged for rollup in rollups)
+    text = (
+        f"📆 Статистика за {months} мес.:\n\n"
+        + "\n".join(lines)
+        + "\n\n"
+        f"Итого за {days_logged} дн.:\n"
+        f"💧 Выпито воды: {sum(rollup.water_sum for rollup in rollups):.0f} мл\n"
+        f"🍎 Потреблено калорий: {sum(rollup.calories_sum for rollup in rollups):.0f} ккал\n"
+        f"🔥 Сожжено калорий: {sum(rollup.burned_sum for rollup in rollups):.0f} ккал\n"
+        f"🎯 Норма воды выполнена: {sum(rollup.water_goal_days for rollup in rollups)} дн., "
+        f"норма калорий: {sum(rollup.calorie_goal_days for rollup in rollups)} дн."
+    )
+    await show_menu_with_back_button(callback, text, "statistics")
+
+
 @router.callback_query(F.data == "achievements")
 async def achievements(callback: CallbackQuery):
-    with get_db() as db:
-        user = db.query(User).filter(User.user_id == callback.from_user.id).first()
-        if user:
-            achievements = [
-                "🏅 Выпито 2 литра воды за день",
-                "🏅 Сожжено 500 ккал за тренировку",
-                "🏅 Достигнута дневная норма калорий",
-            ]
+    user = await get_profile(callback.from_user.id)
+    if user:
+        await activity_logger.flush_user(user.user_id)
+        async with get_async_db() as db:
+            achievements = await get_user_achievements(db, user.user_id)
+            streaks = await get_user_streaks(db, user.user_id)
+
+        if achievements:
             text = "🏆 Ваши ачивки:\n\n" + "\n".join(achievements)
         else:
-            text = "❌ Профиль не найден. Сначала создайте профиль."
+            text = "🏆 Ачивок пока нет. Записывайте воду, еду и тренировки, чтобы их получить!"
+
+        streak = streaks.get("logging")
+        if streak:
+            current = streak.current if streak.last_date >= datetime.today().date() - timedelta(days=1) else 0
+            text += f"\n\n📅 Серия записей: {current} дн. (рекорд {streak.best} дн.)"
+    else:
+        text = "❌ Профиль не найден. Сначала создайте профиль."
 
     await show_menu_with_back_button(callback, text)
 
@@ -592,14 +695,3 @@ async def worker(callback: CallbackQuery):
 @router.callback_query(F.data == "start")
 async def back_to_start(callback: CallbackQuery):
     await show_main_menu(callback)
-
-
-def calculate_water_goal(data, temperature):
-    base = data['weight'] * 30
-    activity = (data['activity'] // 30) * 500
-    temp_addition = 500 if temperature > 25 else 0
-    return base + activity + temp_addition
-
-
-def calculate_calorie_goal(data):
-    return (10 * data['weight'] + 6.25 * data['height'] - 5 * data['age']) * 1.5
\ No newline at end of file
@@ -0,0 +1,19 @@
+from app.models.user import User, DailyData
+from app.models.rollup import WeeklyRollup, MonthlyRollup
+from app.models.achievement import UserAchievement, UserStreak
+from app.models.activity_event import ActivityEvent, CompactionWatermark
+from app.models.fsm import FsmRecord
+from app.models.translation import Translation
+
+__all__ = [
+    "User",
+    "DailyData",
+    "WeeklyRollup",
+    "MonthlyRollup",
+    "UserAchievement",
+    "UserStreak",
+    "ActivityEvent",
+    "CompactionWatermark",
+    "FsmRecord",
+    "Translation"
+]
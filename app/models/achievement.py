@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey
+
+from app.db.db import Base
+
+__all__ = [
+    "UserAchievement",
+    "UserStreak"
+]
+
+
+class UserAchievement(Base):
+    __tablename__ = "user_achievements"
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    code = Column(String, primary_key=True)
+    unlocked_at = Column(DateTime, nullable=False)
+
+
+class UserStreak(Base):
+    __tablename__ = "user_streaks"
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    kind = Column(String, primary_key=True)
+    current = Column(Integer, nullable=False, default=0)
+    best = Column(Integer, nullable=False, default=0)
+    last_date = Column(Date, nullable=True)
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Index
+
+from app.db.db import Base
+
+__all__ = [
+    "ActivityEvent",
+    "CompactionWatermark"
+]
+
+
+class ActivityEvent(Base):
+    __tablename__ = "activity_events"
+    __table_args__ = (
+        Index("ix_activity_events_user_ts", "user_id", "ts"),
+    )
+
+    # Псевдоним rowid: новые события дописываются в конец таблицы
+    event_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    ts = Column(DateTime, nullable=False)
+    kind = Column(String, nullable=False)
+    water = Column(Float, nullable=False, default=0)
+    calories = Column(Float, nullable=False, default=0)
+    burned = Column(Float, nullable=False, default=0)
+    food_name = Column(String, nullable=True)
+    food_grams = Column(Float, nullable=True)
+    workout_type = Column(String, nullable=True)
+    workout_minutes = Column(Integer, nullable=True)
+
+
+class CompactionWatermark(Base):
+    __tablename__ = "compaction_watermarks"
+
+    name = Column(String, primary_key=True)
+    last_event_id = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Text, Float
+
+from app.db.db import Base
+
+__all__ = [
+    "FsmRecord"
+]
+
+
+class FsmRecord(Base):
+    __tablename__ = "fsm_records"
+
+    key = Column(String, primary_key=True)
+    chat_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    state = Column(String, nullable=True)
+    data = Column(Text, nullable=False, default="{}")
+    updated_at = Column(Float, nullable=False)
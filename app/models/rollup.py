@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, Float
+
+from app.db.db import Base
+
+__all__ = [
+    "WeeklyRollup",
+    "MonthlyRollup"
+]
+
+
+class RollupColumns:
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    water_sum = Column(Float, nullable=False, default=0)
+    calories_sum = Column(Float, nullable=False, default=0)
+    burned_sum = Column(Float, nullable=False, default=0)
+    days_logged = Column(Integer, nullable=False, default=0)
+    water_goal_days = Column(Integer, nullable=False, default=0)
+    calorie_goal_days = Column(Integer, nullable=False, default=0)
+
+
+class WeeklyRollup(RollupColumns, Base):
+    __tablename__ = "weekly_rollups"
+
+
+class MonthlyRollup(RollupColumns, Base):
+    __tablename__ = "monthly_rollups"
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String
+
+from app.db.db import Base
+
+__all__ = [
+    "Translation"
+]
+
+
+class Translation(Base):
+    __tablename__ = "translations"
+
+    src = Column(String(8), primary_key=True)
+    dest = Column(String(8), primary_key=True)
+    text = Column(String, primary_key=True)
+    translated = Column(String, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Float, Index, Boolean
 from sqlalchemy.orm import relationship
 from app.db.db import Base
 
@@ -16,6 +16,7 @@ class User(Base):
     height = Column(Float, nullable=False)
     age = Column(Integer, nullable=False)
     city = Column(String, nullable=False)
+    activity = Column(Integer, nullable=True)
     water_level = Column(Float, nullable=False)
     calorie_level = Column(Float, nullable=False)
 
@@ -27,6 +28,9 @@ class User(Base):
 
 class DailyData(Base):
     __tablename__ = "daily_data"
+    __table_args__ = (
+        Index("uq_daily_data_user_date", "user_id", "date", unique=True),
+    )
 
     daily_data_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"))
@@ -34,6 +38,9 @@ class DailyData(Base):
     logged_water = Column(Float, nullable=True)
     logged_calories = Column(Float, nullable=True)
     burned_calories = Column(Float, nullable=True)
+    # Выполнена ли норма по состоянию на последнее обновление дня: из этих флагов складываются роллапы
+    water_goal_met = Column(Boolean, nullable=True)
+    calorie_goal_met = Column(Boolean, nullable=True)
 
     user = relationship(
         "User",
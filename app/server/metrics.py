@@ -0,0 +1,23 @@
+from aiohttp import web
+
+from app.utils.metrics import metrics
+
+
+__all__ = ["start_metrics_server"]
+
+
+async def handle_metrics(_: web.Request) -> web.Response:
+    return web.Response(
+        body=metrics.render().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
@@ -0,0 +1,367 @@
+import asyncio
+import json
+import logging
+import os
+import secrets
+import signal
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from app.settings.config import config
+from app.settings.worker_auth import SECRET_HEADER, worker_secret
+from app.utils.metrics import metrics
+
+
+__all__ = ["shard_key", "Supervisor", "run_supervisor"]
+
+
+logger = logging.getLogger(__name__)
+
+
+WORKER_PATH = "/update"
+RESTART_BACKOFF_MAX = 30.0
+
+
+def _api_url(method: str) -> str:
+    base = (config.telegram_api_url or "https://api.telegram.org").rstrip("/")
+    return f"{base}/bot{config.token_bot.get_secret_value()}/{method}"
+
+
+def shard_key(update: Dict[str, Any]) -> int:
+    # Апдейты одного пользователя всегда попадают в один воркер:
+    # его FSM-состояние, кэши профиля и write-behind живут в памяти этого процесса
+    for name, payload in update.items():
+        if name == "update_id" or not isinstance(payload, dict):
+            continue
+        for field in ("from", "user"):
+            if isinstance(payload.get(field), dict):
+                return payload[field]["id"]
+        if isinstance(payload.get("chat"), dict):
+            return payload["chat"]["id"]
+    return 0
+
+
+class Worker:
+    def __init__(self, index: int, port: int, env: Dict[str, str], queue_size: int):
+        self.index = index
+        self.port = port
+        self.env = env
+        self.url = f"http://{config.worker_host}:{port}"
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.healthy = asyncio.Event()
+        self.restarts = 0
+        self.forwarded = 0
+        self.dropped = 0
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": self.pid,
+            "healthy": self.healthy.is_set(),
+            "queued": self.queue.qsize(),
+            "forwarded": self.forwarded,
+            "dropped": self.dropped,
+            "restarts": self.restarts,
+        }
+
+
+class Supervisor:
+    def __init__(self, script: str, workers: int, allowed_updates: List[str]):
+        self.script = script
+        self.allowed_updates = allowed_updates
+        # Тот же секрет знают воркеры и CLI: им подписывается сброс кэшей после пересчёта норм
+        self.secret = worker_secret()
+        self.workers = [
+            Worker(index, config.worker_base_port + index, self._worker_env(index), config.worker_queue_size)
+            for index in range(workers)
+        ]
+        self._stopping = asyncio.Event()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _worker_env(self, index: int) -> Dict[str, str]:
+        env = dict(os.environ)
+        # Настройки читаются из окружения, поэтому воркеру достаточно переопределить переменные
+        env.update({
+            "WORKER_INDEX": str(index),
+            "BOT_MODE": "webhook",
+            "WEBHOOK_HOST": config.worker_host,
+            "WEBHOOK_PORT": str(config.worker_base_port + index),
+            "WEBHOOK_PATH": WORKER_PATH,
+            "WEBHOOK_BASE_URL": "",
+            "WEBHOOK_SECRET": self.secret,
+            # Ночной пересчёт норм обходит всех пользователей, его достаточно запускать в одном воркере
+            "GOAL_REFRESH_ENABLED": "true" if config.goal_refresh_enabled and index == 0 else "false",
+        })
+        if config.metrics_port:
+            env["METRICS_PORT"] = str(config.metrics_port + 1 + index)
+        return env
+
+    def worker_for(self, update: Dict[str, Any]) -> Worker:
+        return self.workers[hash(shard_key(update)) % len(self.workers)]
+
+    async def dispatch(self, update: Dict[str, Any]):
+        # Очередь ограничена: если воркер не успевает, фронтенд перестаёт принимать апдейты
+        await self.worker_for(update).queue.put(update)
+
+    async def _keep_alive(self, worker: Worker):
+        backoff = 1.0
+        while not self._stopping.is_set():
+            worker.healthy.clear()
+            worker.process = await asyncio.create_subprocess_exec(sys.executable, self.script, env=worker.env)
+            logger.info("Worker started", extra={"worker": worker.index, "pid": worker.pid})
+            started = time.monotonic()
+            code = await worker.process.wait()
+            worker.healthy.clear()
+            if self._stopping.is_set():
+                return
+
+            worker.restarts += 1
+            metrics.inc("supervisor_worker_restarts_total", worker=str(worker.index))
+            # Воркер, падающий сразу после старта, перезапускаем всё реже
+            backoff = 1.0 if time.monotonic() - started > RESTART_BACKOFF_MAX else min(backoff * 2, RESTART_BACKOFF_MAX)
+            logger.warning(
+                "Worker exited, restarting",
+                extra={"worker": worker.index, "code": code, "restart_in": backoff}
+            )
+            try:
+                await asyncio.wait_for(self._stopping.wait(), backoff)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _check_health(self, worker: Worker) -> bool:
+        try:
+            async with self._session.get(
+                worker.url + "/health",
+                timeout=aiohttp.ClientTimeout(total=config.worker_health_interval)
+            ) as response:
+                return response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def _watch_health(self, worker: Worker):
+        failures = 0
+        while not self._stopping.is_set():
+            process, started = worker.process, time.monotonic()
+            # После (пере)запуска ждём первого ответа, импорт бота занимает несколько секунд
+            while not worker.healthy.is_set() and process is not None and process.returncode is None:
+                if await self._check_health(worker):
+                    worker.healthy.set()
+                    failures = 0
+                    logger.info("Worker is healthy", extra={"worker": worker.index, "pid": worker.pid})
+                elif time.monotonic() - started > config.worker_start_timeout:
+                    logger.error("Worker did not start in time, killing", extra={"worker": worker.index})
+                    process.kill()
+                    break
+                else:
+                    await asyncio.sleep(0.5)
+
+            if not worker.healthy.is_set():
+                # Процесс ещё не запущен или уже завершился, ждём перезапуска
+                await asyncio.sleep(0.5)
+                continue
+
+            await asyncio.sleep(config.worker_health_interval)
+            if worker.process is not process:
+                continue
+            if await self._check_health(worker):
+                failures = 0
+                continue
+
+            failures += 1
+            logger.warning("Worker health check failed", extra={"worker": worker.index, "failures": failures})
+            if failures >= config.worker_health_failures and process.returncode is None:
+                # Завис, а не упал: убиваем, _keep_alive поднимет новый процесс
+                logger.error("Worker is unresponsive, killing", extra={"worker": worker.index})
+                worker.healthy.clear()
+                process.kill()
+                failures = 0
+
+    async def _forward(self, worker: Worker):
+        headers = {SECRET_HEADER: self.secret}
+        timeout = aiohttp.ClientTimeout(total=config.http_timeout)
+        while True:
+            update = await worker.queue.get()
+            deadline = time.monotonic() + config.worker_start_timeout
+            while True:
+                try:
+                    await asyncio.wait_for(worker.healthy.wait(), max(deadline - time.monotonic(), 0))
+                    async with self._session.post(
+                        worker.url + WORKER_PATH, json=update, headers=headers, timeout=timeout
+                    ) as response:
+                        if response.status == 200:
+                            worker.forwarded += 1
+                            break
+                        logger.warning(
+                            "Worker rejected update",
+                            extra={"worker": worker.index, "status": response.status}
+                        )
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+
+                if time.monotonic() >= deadline:
+                    worker.dropped += 1
+                    metrics.inc("supervisor_updates_dropped_total", worker=str(worker.index))
+                    logger.error(
+                        "Update dropped, worker unavailable",
+                        extra={"worker": worker.index, "update_id": update.get("update_id")}
+                    )
+                    break
+                await asyncio.sleep(0.2)
+            worker.queue.task_done()
+
+    async def _poll(self):
+        url = _api_url("getUpdates")
+        offset: Optional[int] = None
+        timeout = aiohttp.ClientTimeout(total=config.http_timeout + 30)
+
+        while not self._stopping.is_set():
+            params = {"timeout": "30", "allowed_updates": json.dumps(self.allowed_updates)}
+            if offset is not None:
+                params["offset"] = str(offset)
+            try:
+                async with self._session.get(url, params=params, timeout=timeout) as response:
+                    data = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning(f"getUpdates failed: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            if not data.get("ok"):
+                logger.warning("getUpdates failed", extra={"description": data.get("description")})
+                await asyncio.sleep(1)
+                continue
+
+            for update in data["result"]:
+                await self.dispatch(update)
+                offset = update["update_id"] + 1
+
+    async def _serve_webhook(self) -> web.AppRunner:
+        secret_token = config.webhook_secret.get_secret_value() if config.webhook_secret else None
+
+        async def receive(request: web.Request) -> web.Response:
+            if secret_token and not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), secret_token):
+                return web.Response(status=401)
+            await self.dispatch(await request.json())
+            return web.Response()
+
+        async def health(_: web.Request) -> web.Response:
+            workers = {str(worker.index): worker.stats() for worker in self.workers}
+            healthy = all(worker.healthy.is_set() for worker in self.workers)
+            return web.json_response({"status": "ok" if healthy else "degraded", "workers": workers})
+
+        app = web.Application()
+        app.router.add_post(config.webhook_path, receive)
+        app.router.add_get("/health", health)
+
+        runner = web.AppRunner(app, handle_signals=False)
+        await runner.setup()
+        await web.TCPSite(runner, host=config.webhook_host, port=config.webhook_port).start()
+
+        if config.webhook_base_url:
+            async with self._session.post(
+                _api_url("setWebhook"),
+                json={
+                    "url": config.webhook_base_url.rstrip("/") + config.webhook_path,
+                    "allowed_updates": self.allowed_updates,
+                    **({"secret_token": secret_token} if secret_token else {}),
+                }
+            ) as response:
+                if not (await response.json()).get("ok"):
+                    logger.error("setWebhook failed")
+        return runner
+
+    def _collect(self):
+        return [
+            (f"supervisor_worker_{field}", {"worker": str(worker.index)}, float(value))
+            for worker in self.workers
+            for field, value in worker.stats().items() if field != "pid"
+        ]
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        self._session = aiohttp.ClientSession()
+        metrics.register_collector(self._collect)
+        for worker in self.workers:
+            self._tasks.append(asyncio.create_task(self._keep_alive(worker)))
+            self._tasks.append(asyncio.create_task(self._watch_health(worker)))
+            self._tasks.append(asyncio.create_task(self._forward(worker)))
+
+        runner, poller = None, None
+        if config.bot_mode == "webhook":
+            runner = await self._serve_webhook()
+        else:
+            poller = asyncio.create_task(self._poll())
+
+        metrics_runner = None
+        if config.metrics_port:
+            from app.server.metrics import start_metrics_server
+            metrics_runner = await start_metrics_server(config.metrics_host, config.metrics_port)
+
+        logger.info("Supervisor started", extra={"workers": len(self.workers), "mode": config.bot_mode})
+        try:
+            await self._stopping.wait()
+        finally:
+            await self.stop(runner, poller, metrics_runner)
+
+    async def stop(
+        self,
+        runner: Optional[web.AppRunner],
+        poller: Optional[asyncio.Task],
+        metrics_runner: Optional[web.AppRunner]
+    ):
+        self._stopping.set()
+        # Новые апдейты больше не принимаем
+        if runner is not None:
+            await runner.cleanup()
+        if poller is not None:
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+
+        # Сначала отдаём воркерам уже принятые апдейты, затем останавливаем их
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(worker.queue.join() for worker in self.workers)),
+                config.shutdown_drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown with undelivered updates", extra={
+                "queued": sum(worker.queue.qsize() for worker in self.workers)
+            })
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        processes = [worker.process for worker in self.workers if worker.process and worker.process.returncode is None]
+        for process in processes:
+            process.terminate()
+        try:
+            # Воркер сам дожидается обработки апдейтов в работе, даём ему на это время
+            await asyncio.wait_for(
+                asyncio.gather(*(process.wait() for process in processes)),
+                config.shutdown_drain_timeout + 5
+            )
+        except asyncio.TimeoutError:
+            for process in processes:
+                if process.returncode is None:
+                    process.kill()
+
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await self._session.close()
+
+
+async def run_supervisor(script: str, allowed_updates: List[str]):
+    await Supervisor(script, config.workers, allowed_updates).run()
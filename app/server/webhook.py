@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import secrets
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.services.goal_refresh import INVALIDATE_GOALS_PATH, invalidate_goal_caches
+from app.settings.concurrency import ConcurrencyLimitMiddleware
+from app.settings.config import config
+from app.settings.worker_auth import SECRET_HEADER, worker_secret
+
+
+__all__ = ["run_webhook"]
+
+
+logger = logging.getLogger(__name__)
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, limiter: ConcurrencyLimitMiddleware):
+    secret_token = config.webhook_secret.get_secret_value() if config.webhook_secret else None
+
+    async def set_webhook():
+        if config.webhook_base_url:
+            await bot.set_webhook(
+                url=config.webhook_base_url.rstrip("/") + config.webhook_path,
+                secret_token=secret_token,
+                allowed_updates=dp.resolve_used_update_types()
+            )
+
+    async def drain_updates(_: web.Application):
+        # Дожидаемся обработки принятых апдейтов до закрытия сессии бота
+        if not await limiter.drain(config.shutdown_drain_timeout):
+            logger.warning(f"Shutdown with {limiter.in_flight} updates still in flight")
+
+    async def health(_: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "worker": config.worker_index, "in_flight": limiter.in_flight})
+
+    async def invalidate_goals(request: web.Request) -> web.Response:
+        # Ночной пересчёт норм в соседнем воркере изменил профили, которые могут лежать в нашем кэше
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), worker_secret()):
+            return web.Response(status=401)
+        invalidate_goal_caches()
+        return web.Response()
+
+    dp.startup.register(set_webhook)
+
+    app = web.Application()
+    app.on_shutdown.append(drain_updates)
+    app.router.add_get("/health", health)
+    if config.worker_index is not None:
+        app.router.add_post(INVALIDATE_GOALS_PATH, invalidate_goals)
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=secret_token
+    ).register(app, path=config.webhook_path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.webhook_host, port=config.webhook_port)
+    await site.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
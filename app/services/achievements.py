@@ -0,0 +1,141 @@
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.daily_data import DailyTotals
+from app.models.achievement import UserAchievement, UserStreak
+
+
+__all__ = [
+    "AchievementEvent",
+    "Achievement",
+    "ACHIEVEMENTS",
+    "STREAKS",
+    "evaluate_achievements",
+    "get_user_achievements",
+    "get_user_streaks"
+]
+
+
+class AchievementEvent(NamedTuple):
+    day: date
+    before: DailyTotals
+    after: DailyTotals
+    workout_burned: float
+    water_goal: float
+    calorie_goal: float
+    streaks: Dict[str, int]
+
+
+class Achievement(NamedTuple):
+    code: str
+    title: str
+    check: Callable[[AchievementEvent], bool]
+
+
+# Серия продлевается в тот момент, когда условие впервые выполнилось за день
+STREAKS: Dict[str, Callable[[AchievementEvent], bool]] = {
+    "logging": lambda event: any(event.after) and not any(event.before),
+    "water_goal": lambda event: event.before.logged_water < event.water_goal <= event.after.logged_water,
+}
+
+ACHIEVEMENTS: List[Achievement] = [
+    Achievement("water_2l", "💧 Выпито 2 литра воды за день",
+                lambda event: event.after.logged_water >= 2000),
+    Achievement("water_goal", "🏅 Достигнута дневная норма воды",
+                lambda event: event.after.logged_water >= event.water_goal),
+    Achievement("calorie_goal", "🏅 Достигнута дневная норма калорий",
+                lambda event: event.after.logged_calories >= event.calorie_goal),
+    Achievement("workout_500", "🔥 Сожжено 500 ккал за тренировку",
+                lambda event: event.workout_burned >= 500),
+    Achievement("burned_1000", "🔥 Сожжено 1000 ккал за день",
+                lambda event: event.after.burned_calories >= 1000),
+    Achievement("streak_7", "📅 7 дней подряд с записями",
+                lambda event: event.streaks.get("logging", 0) >= 7),
+    Achievement("streak_30", "📅 30 дней подряд с записями",
+                lambda event: event.streaks.get("logging", 0) >= 30),
+    Achievement("water_streak_7", "💧 7 дней подряд с нормой воды",
+                lambda event: event.streaks.get("water_goal", 0) >= 7),
+]
+
+_TITLES = {achievement.code: achievement.title for achievement in ACHIEVEMENTS}
+
+
+async def _advance_streaks(db: AsyncSession, user_id: int, event: AchievementEvent, kinds: List[str]):
+    rows = {
+        streak.kind: streak
+        for streak in (await db.scalars(
+            select(UserStreak).where(UserStreak.user_id == user_id, UserStreak.kind.in_(kinds))
+        )).all()
+    }
+
+    for kind in kinds:
+        streak = rows.get(kind)
+        if streak is None:
+            streak = UserStreak(user_id=user_id, kind=kind, current=0, best=0)
+            db.add(streak)
+        elif streak.last_date is not None and event.day < streak.last_date:
+            # Запоздавшее событие за прошедший день (компакция идёт не по порядку дней)
+            # не продлевает и не обрывает текущую серию
+            continue
+
+        if streak.last_date == event.day:
+            pass
+        elif streak.last_date == event.day - timedelta(days=1):
+            streak.current += 1
+        else:
+            streak.current = 1
+        streak.last_date = event.day
+        streak.best = max(streak.best, streak.current)
+        event.streaks[kind] = streak.current
+
+
+async def evaluate_achievements(
+    db: AsyncSession,
+    user_id: int,
+    day: date,
+    before: DailyTotals,
+    after: DailyTotals,
+    workout_burned: float,
+    water_goal: float,
+    calorie_goal: float
+) -> List[Achievement]:
+    event = AchievementEvent(day, before, after, workout_burned, water_goal, calorie_goal, {})
+
+    # Серии читаем только при переходе, остальные правила проверяются по дельте без запросов
+    kinds = [kind for kind, extends in STREAKS.items() if extends(event)]
+    if kinds:
+        await _advance_streaks(db, user_id, event, kinds)
+        await db.flush()
+
+    codes = [achievement.code for achievement in ACHIEVEMENTS if achievement.check(event)]
+    if not codes:
+        return []
+
+    now = datetime.now()
+    unlocked = (await db.scalars(
+        insert(UserAchievement)
+        .values([{"user_id": user_id, "code": code, "unlocked_at": now} for code in codes])
+        .on_conflict_do_nothing()
+        .returning(UserAchievement.code)
+    )).all()
+    return [achievement for achievement in ACHIEVEMENTS if achievement.code in unlocked]
+
+
+async def get_user_achievements(db: AsyncSession, user_id: int) -> List[str]:
+    codes = (await db.scalars(
+        select(UserAchievement.code)
+        .where(UserAchievement.user_id == user_id)
+        .order_by(UserAchievement.unlocked_at)
+    )).all()
+    return [_TITLES[code] for code in codes if code in _TITLES]
+
+
+async def get_user_streaks(db: AsyncSession, user_id: int) -> Dict[str, UserStreak]:
+    return {
+        streak.kind: streak
+        for streak in (await db.scalars(select(UserStreak).where(UserStreak.user_id == user_id))).all()
+    }
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import random
+from datetime import date, datetime
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.db import get_async_db
+from app.db.activity_events import (
+    append_event,
+    get_watermark,
+    advance_watermark,
+    get_events_after,
+    get_live_totals
+)
+from app.db.daily_data import DailyTotals, increment_daily_data
+from app.db.rollups import apply_rollup_delta
+from app.models.user import User
+from app.services.achievements import evaluate_achievements
+from app.services.chart_cache import chart_cache
+from app.services.profile_cache import ProfileSnapshot
+from app.settings.config import config
+
+
+__all__ = ["ActivityLogger", "activity_logger"]
+
+
+logger = logging.getLogger(__name__)
+
+
+DayKey = Tuple[int, date]
+
+STALE_RETRIES = 5
+STALE_RETRY_DELAY = 0.05
+
+
+class _StaleWatermark(Exception):
+    pass
+
+
+class _DayBatch:
+    __slots__ = ("water", "calories", "burned", "max_burned")
+
+    def __init__(self):
+        self.water = 0.0
+        self.calories = 0.0
+        self.burned = 0.0
+        self.max_burned = 0.0
+
+
+async def _compact_batch(db: AsyncSession, batch_size: int) -> Tuple[int, Optional[datetime]]:
+    # Сворачивает события после отметки в DailyData, роллапы и достижения;
+    # всё вместе со сдвигом отметки фиксируется одной транзакцией
+    watermark = await get_watermark(db)
+    events = await get_events_after(db, watermark, batch_size)
+    if not events:
+        return 0, None
+
+    days: Dict[DayKey, _DayBatch] = {}
+    for _, user_id, ts, water, calories, burned in events:
+        batch = days.get((user_id, ts.date()))
+        if batch is None:
+            batch = days[(user_id, ts.date())] = _DayBatch()
+        batch.water += water
+        batch.calories += calories
+        batch.burned += burned
+        batch.max_burned = max(batch.max_burned, burned)
+
+    # Нормы берём текущие: событие хранит факт, а не цель на момент записи
+    goals = {
+        user_id: (water_level, calorie_level)
+        for user_id, water_level, calorie_level in (await db.execute(
+            select(User.user_id, User.water_level, User.calorie_level)
+            .where(User.user_id.in_({user_id for user_id, _ in days}))
+        )).all()
+    }
+
+    for (user_id, day), batch in days.items():
+        water_goal, calorie_goal = goals.get(user_id, (0.0, 0.0))
+        after = await increment_daily_data(db, user_id, day, batch.water, batch.calories, batch.burned)
+        before = DailyTotals(
+            after.logged_water - batch.water,
+            after.logged_calories - batch.calories,
+            after.burned_calories - batch.burned
+        )
+        await apply_rollup_delta(db, user_id, day, before, after, water_goal, calorie_goal)
+        await evaluate_achievements(db, user_id, day, before, after, batch.max_burned, water_goal, calorie_goal)
+
+    if not await advance_watermark(db, watermark, events[-1][0]):
+        raise _StaleWatermark()
+    return len(events), min(event[2] for event in events)
+
+
+async def _fold_event(
+    db: AsyncSession,
+    user: ProfileSnapshot,
+    event_id: int,
+    day: date,
+    water: float,
+    calories: float,
+    burned: float
+) -> bool:
+    # Вставка события держит блокировку записи до коммита, поэтому если отметка стоит
+    # прямо перед ним, сворачивать нужно только его; иначе в журнале есть хвост
+    watermark = await get_watermark(db)
+    if watermark != event_id - 1:
+        return False
+
+    after = await increment_daily_data(db, user.user_id, day, water, calories, burned)
+    before = DailyTotals(after.logged_water - water, after.logged_calories - calories, after.burned_calories - burned)
+    await apply_rollup_delta(db, user.user_id, day, before, after, user.water_level, user.calorie_level)
+    await evaluate_achievements(db, user.user_id, day, before, after, burned, user.water_level, user.calorie_level)
+
+    if not await advance_watermark(db, watermark, event_id):
+        raise _StaleWatermark()
+    return True
+
+
+class ActivityLogger:
+    def __init__(self, write_behind: bool, flush_interval: float, flush_max_events: int, batch_size: int):
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_max_events = flush_max_events
+        self.batch_size = batch_size
+        self._pending_events = 0
+        self._pending_users: Set[int] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.logged_events = 0
+        self.compactions = 0
+        self.compacted_events = 0
+        self.stale_compactions = 0
+        self.last_compaction_size = 0
+        self.last_compaction_lag = 0.0
+        self.max_compaction_lag = 0.0
+
+    async def log(
+        self,
+        user: ProfileSnapshot,
+        kind: str,
+        water: float = 0.0,
+        calories: float = 0.0,
+        burned: float = 0.0,
+        **details
+    ) -> DailyTotals:
+        ts = datetime.now()
+        day = ts.date()
+
+        async with get_async_db() as db:
+            event_id = await append_event(
+                db, user.user_id, kind, ts=ts, water=water, calories=calories, burned=burned, **details
+            )
+            if not self.write_behind:
+                # Без отложенной записи событие сворачивается сразу, в той же транзакции;
+                # хвост несвёрнутых событий (например, после работы с write-behind) доводим пачкой
+                if await _fold_event(db, user, event_id, day, water, calories, burned):
+                    self._record_compaction(1, ts)
+                else:
+                    self._record_compaction(*await _compact_batch(db, self.batch_size))
+            await db.commit()
+            totals = await get_live_totals(db, user.user_id, day)
+        self.logged_events += 1
+        chart_cache.bump_version(user.user_id)
+
+        if self.write_behind:
+            self._pending_events += 1
+            self._pending_users.add(user.user_id)
+            if self._pending_events >= self.flush_max_events:
+                # Событие уже записано: сбой компакции не должен дойти до обработчика,
+                # иначе пользователь повторит ввод и событие учтётся дважды
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("Activity event compaction failed")
+            # После неудачной компакции события остаются в очереди, их свернёт фоновая задача
+            if self._pending_events and (self._flush_task is None or self._flush_task.done()):
+                self._flush_task = asyncio.create_task(self._delayed_flush())
+
+        return totals
+
+    def _record_compaction(self, events: int, oldest: Optional[datetime]):
+        if not events:
+            return
+        self.compactions += 1
+        self.compacted_events += events
+        self.last_compaction_size = events
+        self.last_compaction_lag = (datetime.now() - oldest).total_seconds()
+        self.max_compaction_lag = max(self.max_compaction_lag, self.last_compaction_lag)
+
+    async def _delayed_flush(self):
+        while self._pending_events:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Activity event compaction failed")
+
+    async def flush(self):
+        async with self._flush_lock:
+            users, self._pending_users = self._pending_users, set()
+            events, self._pending_events = self._pending_events, 0
+
+            stale = 0
+            try:
+                while True:
+                    try:
+                        async with get_async_db() as db:
+                            compacted, oldest = await _compact_batch(db, self.batch_size)
+                            await db.commit()
+                    except _StaleWatermark:
+                        # Эти события уже свернул другой воркер, перечитываем отметку
+                        self.stale_compactions += 1
+                        stale += 1
+                        if stale >= STALE_RETRIES:
+                            raise
+                        # Пауза со случайным разбросом, чтобы воркеры не сталкивались снова
+                        await asyncio.sleep(random.uniform(0.5, 1.0) * STALE_RETRY_DELAY * stale)
+                        continue
+                    self._record_compaction(compacted, oldest)
+                    if compacted < self.batch_size:
+                        break
+            except Exception:
+                # События уже в журнале, при следующей компакции они будут свёрнуты
+                self._pending_users |= users
+                self._pending_events += events
+                raise
+
+    async def flush_user(self, user_id: int):
+        # Графики и статистика читают свёрнутые данные, поэтому перед ними сворачиваем журнал
+        if user_id in self._pending_users:
+            await self.flush()
+
+    async def start(self):
+        # После перезапуска в журнале могли остаться несвёрнутые события
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def close(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "pending_users": len(self._pending_users),
+            "pending_events": self._pending_events,
+            "logged_events": self.logged_events,
+            "compactions": self.compactions,
+            "compacted_events": self.compacted_events,
+            "stale_compactions": self.stale_compactions,
+            "last_compaction_size": self.last_compaction_size,
+            "last_compaction_lag": self.last_compaction_lag,
+            "max_compaction_lag": self.max_compaction_lag
+        }
+
+
+activity_logger = ActivityLogger(
+    write_behind=config.write_behind_enabled,
+    flush_interval=config.write_behind_interval_ms / 1000,
+    flush_max_events=config.write_behind_max_events,
+    batch_size=config.activity_compaction_batch_size
+)
@@ -0,0 +1,168 @@
+import hashlib
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.settings.config import config
+
+
+__all__ = ["CachedChart", "ChartCache", "chart_cache"]
+
+
+ChartKey = Tuple[int, str, date, date, int]
+
+
+class CachedChart:
+    __slots__ = ("png", "file_id")
+
+    def __init__(self, png: Optional[bytes] = None, file_id: Optional[str] = None):
+        self.png = png
+        self.file_id = file_id
+
+    @property
+    def size(self) -> int:
+        return len(self.png) if self.png else 0
+
+
+class ChartCache:
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        spill_dir: Optional[str] = None,
+        spill_max_bytes: int = 0
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.spill_max_bytes = spill_max_bytes
+        self._entries: OrderedDict[ChartKey, CachedChart] = OrderedDict()
+        self._spilled: OrderedDict[ChartKey, Tuple[Path, int]] = OrderedDict()
+        self._spilled_bytes = 0
+        self._user_keys: Dict[int, Set[ChartKey]] = {}
+        self._versions: Dict[int, int] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            # Версии графиков живут только в памяти, файлы прошлых запусков уже никогда не прочитать
+            for path in self.spill_dir.glob("*.png"):
+                path.unlink(missing_ok=True)
+
+    def key(self, user_id: int, kind: str, start: date, end: date) -> ChartKey:
+        return user_id, kind, start, end, self._versions.get(user_id, 0)
+
+    def bump_version(self, user_id: int):
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        for key in self._user_keys.pop(user_id, ()):
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+            self._drop_spilled(key)
+
+    def cached_users(self) -> List[int]:
+        return list(self._user_keys)
+
+    def get(self, key: ChartKey) -> Optional[CachedChart]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        spilled = self._spilled.get(key)
+        if spilled is not None and spilled[0].exists():
+            png = spilled[0].read_bytes()
+            self._drop_spilled(key)
+            self.hits += 1
+            return self._store(key, CachedChart(png=png))
+        if spilled is not None:
+            self._drop_spilled(key)
+            self._forget(key)
+
+        self.misses += 1
+        return None
+
+    def put(self, key: ChartKey, png: bytes) -> CachedChart:
+        return self._store(key, CachedChart(png=png))
+
+    def set_file_id(self, key: ChartKey, file_id: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._store(key, CachedChart())
+        # После загрузки в Telegram хватает file_id, байты больше не нужны
+        self._bytes -= entry.size
+        entry.png = None
+        entry.file_id = file_id
+
+    def _store(self, key: ChartKey, entry: CachedChart) -> CachedChart:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+
+        self._entries[key] = entry
+        self._bytes += entry.size
+        self._user_keys.setdefault(key[0], set()).add(key)
+        self._evict()
+        return entry
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or (self._bytes > self.max_bytes and len(self._entries) > 1):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            if self.spill_dir and entry.png and entry.size <= self.spill_max_bytes:
+                path = self.spill_dir / (hashlib.sha1(repr(key).encode()).hexdigest() + ".png")
+                path.write_bytes(entry.png)
+                self._spilled[key] = (path, entry.size)
+                self._spilled_bytes += entry.size
+            elif key not in self._spilled:
+                self._forget(key)
+
+        # Диск тоже ограничен: вытесняем самые давние выгруженные графики
+        while self._spilled_bytes > self.spill_max_bytes:
+            key = next(iter(self._spilled))
+            self._drop_spilled(key)
+            self._forget(key)
+
+    def _forget(self, key: ChartKey):
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def _drop_spilled(self, key: ChartKey):
+        spilled = self._spilled.pop(key, None)
+        if spilled is not None:
+            path, size = spilled
+            path.unlink(missing_ok=True)
+            self._spilled_bytes -= size
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "spilled": len(self._spilled),
+            "spilled_bytes": self._spilled_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+chart_cache = ChartCache(
+    max_entries=config.chart_cache_size,
+    max_bytes=config.chart_cache_max_bytes,
+    # У каждого воркера супервизора свой каталог, иначе при старте он удалил бы чужие файлы
+    spill_dir=(
+        str(Path(config.chart_cache_spill_dir) / f"worker-{config.worker_index}")
+        if config.chart_cache_spill_dir and config.worker_index is not None
+        else config.chart_cache_spill_dir
+    ),
+    spill_max_bytes=config.chart_cache_spill_max_bytes
+)
@@ -0,0 +1,54 @@
+import io
+from datetime import date
+from typing import List, Sequence
+
+
+__all__ = ["init_worker", "warm_up", "render_daily_chart", "render_monthly_chart"]
+
+
+def init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def warm_up():
+    from matplotlib.figure import Figure  # noqa: F401
+
+
+def _to_png(fig) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def render_daily_chart(labels: List[str], values: Sequence[float], goals: Sequence[float]) -> bytes:
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.bar(labels, values, label="Факт")
+    ax.bar(labels, goals, alpha=0.5, label="Цель")
+    ax.set_ylabel("Значение")
+    ax.set_title("Прогресс за день")
+    ax.legend()
+    return _to_png(fig)
+
+
+def render_monthly_chart(
+    dates: Sequence[date],
+    water: Sequence[float],
+    calories: Sequence[float],
+    burned: Sequence[float]
+) -> bytes:
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.plot(dates, water, label="Вода")
+    ax.plot(dates, calories, label="Калории")
+    ax.plot(dates, burned, label="Сожжено")
+    ax.set_ylabel("Значение")
+    ax.set_title("Прогресс за месяц")
+    ax.legend()
+    fig.autofmt_xdate()
+    return _to_png(fig)
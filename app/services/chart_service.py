@@ -0,0 +1,90 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Callable, List, Optional, Sequence
+
+from app.settings.config import config
+from app.services.chart_rendering import init_worker, warm_up, render_daily_chart, render_monthly_chart
+from app.utils.metrics import metrics
+
+
+__all__ = ["ChartService", "ChartBusyError", "chart_service"]
+
+
+class ChartBusyError(Exception):
+    pass
+
+
+class ChartService:
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker
+            )
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def _render(self, func: Callable[..., bytes], *args) -> bytes:
+        # Очередь ограничена: при всплеске запросов лучше сразу отказать,
+        # чем копить задачи и задерживать остальные ответы
+        if self._pending >= self.queue_size:
+            raise ChartBusyError("Chart queue is full")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with metrics.track("chart_render_seconds", kind=func.__name__):
+                return await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, func, *args),
+                    timeout=self.timeout
+                )
+        except BrokenProcessPool as e:
+            # Пул пересоздаётся при следующем запросе
+            self._executor = None
+            raise ChartBusyError("Chart worker crashed") from e
+        finally:
+            self._pending -= 1
+
+    async def render_daily(self, labels: List[str], values: Sequence[float], goals: Sequence[float]) -> bytes:
+        return await self._render(render_daily_chart, labels, list(values), list(goals))
+
+    async def render_monthly(
+        self,
+        dates: Sequence[date],
+        water: Sequence[float],
+        calories: Sequence[float],
+        burned: Sequence[float]
+    ) -> bytes:
+        return await self._render(render_monthly_chart, list(dates), list(water), list(calories), list(burned))
+
+    async def warm(self):
+        # Запускаем процессы заранее, чтобы первый график не ждал spawn и импорт matplotlib
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, warm_up) for _ in range(self.workers)))
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+chart_service = ChartService(
+    workers=config.chart_workers,
+    queue_size=config.chart_queue_size,
+    timeout=config.chart_timeout
+)
@@ -0,0 +1,177 @@
+import csv
+import gzip
+import json
+import re
+import sqlite3
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+__all__ = ["FoodIndex", "build_food_index", "iter_dump"]
+
+
+NAME_FIELDS = ("product_name_ru", "product_name_en", "product_name", "generic_name_ru", "generic_name_en")
+MAX_KCAL_100G = 900.0
+MAX_SCAN = 2000
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.casefold().replace("ё", "е")) if len(token) > 1]
+
+
+def normalize_name(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def _open_dump(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "rt", encoding="utf-8", errors="replace")
+
+
+def _kcal(nutriments: Dict) -> Optional[float]:
+    value = nutriments.get("energy-kcal_100g")
+    if value in (None, ""):
+        kj = nutriments.get("energy_100g")
+        if kj in (None, ""):
+            return None
+        try:
+            value = float(kj) / 4.184
+        except (TypeError, ValueError):
+            return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not 0 <= value <= MAX_KCAL_100G:
+        return None
+    return value
+
+
+def iter_dump(path: str | Path) -> Iterator[Tuple[str, float]]:
+    path = Path(path)
+    stem_suffix = Path(path.stem).suffix if path.suffix == ".gz" else path.suffix
+
+    with _open_dump(path) as f:
+        if stem_suffix in (".csv", ".tsv"):
+            csv.field_size_limit(sys.maxsize)
+            rows = csv.DictReader(f, delimiter="\t")
+            for row in rows:
+                kcal = _kcal(row)
+                if kcal is None:
+                    continue
+                for field in NAME_FIELDS:
+                    if row.get(field):
+                        yield row[field], kcal
+        else:
+            for line in f:
+                try:
+                    product = json.loads(line)
+                except ValueError:
+                    continue
+                kcal = _kcal(product.get("nutriments") or {})
+                if kcal is None:
+                    continue
+                for field in NAME_FIELDS:
+                    if product.get(field):
+                        yield product[field], kcal
+
+
+def build_food_index(dump_path: str | Path, index_path: str | Path) -> Dict[str, float]:
+    started = time.perf_counter()
+    foods: Dict[str, float] = {}
+    records = 0
+
+    for name, kcal in iter_dump(dump_path):
+        records += 1
+        normalized = normalize_name(name)
+        if normalized and normalized not in foods:
+            foods[normalized] = kcal
+
+    index_path = Path(index_path)
+    tmp_path = index_path.with_suffix(index_path.suffix + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE foods (name TEXT PRIMARY KEY, kcal REAL NOT NULL) WITHOUT ROWID")
+        # Порядок по длине названия: при загрузке постинги сразу отсортированы
+        rows = sorted(foods.items(), key=lambda item: (len(item[0]), item[0]))
+        conn.executemany("INSERT INTO foods VALUES (?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+    tmp_path.replace(index_path)
+
+    return {
+        "records": records,
+        "names": len(foods),
+        "seconds": time.perf_counter() - started
+    }
+
+
+class FoodIndex:
+    def __init__(self):
+        # Названия хранятся одним UTF-8 блоком со смещениями, без отдельных str
+        self._blob = b""
+        self._offsets = array("Q", [0])
+        self._kcal = array("f")
+        self._postings: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._kcal)
+
+    def _name(self, position: int) -> str:
+        return self._blob[self._offsets[position]:self._offsets[position + 1]].decode("utf-8")
+
+    @classmethod
+    def load(cls, index_path: str | Path) -> "FoodIndex":
+        index = cls()
+        blob = bytearray()
+        postings: Dict[str, List[int]] = {}
+
+        conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute("SELECT name, kcal FROM foods ORDER BY length(name), name")
+            for position, (name, kcal) in enumerate(rows):
+                blob += name.encode("utf-8")
+                index._offsets.append(len(blob))
+                index._kcal.append(kcal)
+                for token in set(name.split()):
+                    postings.setdefault(token, []).append(position)
+        finally:
+            conn.close()
+
+        index._blob = bytes(blob)
+        index._postings = {token: array("I", ids) for token, ids in postings.items()}
+        return index
+
+    def lookup(self, query: str) -> Optional[Tuple[str, float]]:
+        tokens = set(tokenize(query))
+        if not tokens:
+            return None
+
+        lists = []
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                return None
+            lists.append(ids)
+        lists.sort(key=len)
+
+        # Постинги отсортированы по длине названия, поэтому первое название,
+        # содержащее все слова запроса, — точное совпадение или ближайшее к нему
+        if len(lists) == 1:
+            position = lists[0][0]
+            return self._name(position), float(self._kcal[position])
+
+        for position in lists[0][:MAX_SCAN]:
+            name = self._name(position)
+            if tokens.issubset(name.split()):
+                return name, float(self._kcal[position])
+        return None
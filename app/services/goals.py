@@ -0,0 +1,39 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+__all__ = [
+    "HOT_WEATHER_TEMPERATURE",
+    "calculate_water_goal",
+    "calculate_calorie_goal",
+    "water_goals",
+    "calorie_goals"
+]
+
+
+HOT_WEATHER_TEMPERATURE = 25
+
+
+def calculate_water_goal(data, temperature):
+    base = data['weight'] * 30
+    activity = (data['activity'] // 30) * 500
+    temp_addition = 500 if temperature is not None and temperature > HOT_WEATHER_TEMPERATURE else 0
+    return base + activity + temp_addition
+
+
+def calculate_calorie_goal(data):
+    return (10 * data['weight'] + 6.25 * data['height'] - 5 * data['age']) * 1.5
+
+
+# Векторные версии тех же формул для пересчёта всей таблицы за один проход;
+# неизвестная температура передаётся как NaN и надбавку не даёт
+def water_goals(weight: "np.ndarray", activity: "np.ndarray", temperature: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    return weight * 30 + (activity // 30) * 500 + np.where(temperature > HOT_WEATHER_TEMPERATURE, 500, 0)
+
+
+def calorie_goals(weight: "np.ndarray", height: "np.ndarray", age: "np.ndarray") -> "np.ndarray":
+    return (10 * weight + 6.25 * height - 5 * age) * 1.5
@@ -0,0 +1,87 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date
+from typing import IO, Iterator, Optional, Tuple
+
+from sqlalchemy import Engine, select
+
+from app.db.db import engine
+from app.models.user import User, DailyData
+
+
+__all__ = ["EXPORT_FORMATS", "export_filename", "export_history"]
+
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+PROFILE_COLUMNS = ("user_id", "weight", "height", "age", "city", "activity", "water_level", "calorie_level")
+DAILY_COLUMNS = ("date", "logged_water", "logged_calories", "burned_calories")
+
+
+def export_filename(fmt: str, user_id: Optional[int] = None) -> str:
+    name = f"history_{user_id}" if user_id is not None else f"history_{date.today():%Y%m%d}"
+    return f"{name}.csv" if fmt == "csv" else f"{name}.jsonl.gz"
+
+
+def _iter_rows(sync_engine: Engine, user_id: Optional[int], chunk_size: int) -> Iterator[Tuple]:
+    # Профиль и дни одним запросом в порядке (user_id, date): join идёт по уникальному индексу,
+    # сортировка не нужна, а yield_per держит в памяти только одну пачку строк
+    stmt = select(
+        *(getattr(User, column) for column in PROFILE_COLUMNS),
+        *(getattr(DailyData, column) for column in DAILY_COLUMNS)
+    ).outerjoin(DailyData, DailyData.user_id == User.user_id).order_by(User.user_id, DailyData.date)
+    if user_id is not None:
+        stmt = stmt.where(User.user_id == user_id)
+
+    with sync_engine.connect() as conn:
+        result = conn.execution_options(yield_per=chunk_size).execute(stmt)
+        for partition in result.partitions():
+            yield from partition
+
+
+def _write_csv(rows: Iterator[Tuple], output: IO[bytes]) -> int:
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(PROFILE_COLUMNS + DAILY_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    text.detach()
+    return count
+
+
+def _write_jsonl(rows: Iterator[Tuple], output: IO[bytes]) -> int:
+    count = 0
+    last_user = None
+    with gzip.GzipFile(fileobj=output, mode="wb", compresslevel=6) as compressed:
+        for row in rows:
+            profile, daily = row[:len(PROFILE_COLUMNS)], row[len(PROFILE_COLUMNS):]
+            # Профиль пишется один раз перед днями пользователя
+            if profile[0] != last_user:
+                last_user = profile[0]
+                record = {"type": "profile", **dict(zip(PROFILE_COLUMNS, profile))}
+                compressed.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+            if daily[0] is not None:
+                record = {"type": "daily", "user_id": last_user, **dict(zip(DAILY_COLUMNS, daily))}
+                record["date"] = record["date"].isoformat()
+                compressed.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+            count += 1
+    return count
+
+
+def export_history(
+    output: IO[bytes],
+    fmt: str = "csv",
+    user_id: Optional[int] = None,
+    chunk_size: int = 1000,
+    sync_engine: Engine = engine
+) -> int:
+    rows = _iter_rows(sync_engine, user_id, chunk_size)
+    if fmt == "csv":
+        return _write_csv(rows, output)
+    if fmt == "jsonl":
+        return _write_jsonl(rows, output)
+    raise ValueError(f"Unknown export format: {fmt}")
@@ -0,0 +1,51 @@
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from app.settings.config import config
+
+
+__all__ = ["HttpClient", "http_client"]
+
+
+class HttpClient:
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Сессия создаётся лениво, внутри запущенного event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=config.http_pool_size,
+                limit_per_host=config.http_pool_size_per_host,
+                keepalive_timeout=config.http_keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=config.http_timeout,
+                    connect=config.http_connect_timeout
+                )
+            )
+        return self._session
+
+    async def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, Any]:
+        async with self.session.get(url, params=params, headers=headers) as response:
+            if response.status != 200:
+                return response.status, None
+            return response.status, await response.json(content_type=None)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+http_client = HttpClient()
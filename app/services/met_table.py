@@ -0,0 +1,99 @@
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+__all__ = [
+    "ACTIVITIES",
+    "find_activity",
+    "calories_burned",
+    "calories_burned_batch",
+    "calories_burned_for_activities"
+]
+
+
+# (название, MET, синонимы на русском и английском)
+# Значения MET по Compendium of Physical Activities
+ACTIVITIES: Tuple[Tuple[str, float, Tuple[str, ...]], ...] = (
+    ("Ходьба", 3.5, ("ходьба", "прогулка", "шаги", "walking", "walk")),
+    ("Быстрая ходьба", 5.0, ("быстрая ходьба", "скандинавская ходьба", "brisk walking", "nordic walking")),
+    ("Бег", 9.8, ("бег", "пробежка", "running", "run")),
+    ("Лёгкий бег", 7.0, ("легкий бег", "трусца", "джоггинг", "jogging")),
+    ("Велосипед", 7.5, ("велосипед", "велик", "велопрогулка", "cycling", "bicycling", "bike")),
+    ("Велотренажёр", 6.8, ("велотренажер", "сайкл", "stationary bike", "spinning")),
+    ("Плавание", 7.0, ("плавание", "бассейн", "swimming", "swim")),
+    ("Йога", 2.5, ("йога", "yoga")),
+    ("Пилатес", 3.0, ("пилатес", "pilates")),
+    ("Растяжка", 2.3, ("растяжка", "стретчинг", "stretching")),
+    ("Силовая тренировка", 5.0, ("силовая", "силовая тренировка", "тренажерный зал", "качалка", "тренажерка",
+                                 "weight lifting", "weightlifting", "strength training", "gym")),
+    ("Кроссфит", 8.0, ("кроссфит", "crossfit")),
+    ("Аэробика", 7.3, ("аэробика", "степ аэробика", "aerobics")),
+    ("Танцы", 5.0, ("танцы", "зумба", "dancing", "dance", "zumba")),
+    ("Бокс", 7.8, ("бокс", "кикбоксинг", "boxing", "kickboxing")),
+    ("Единоборства", 10.3, ("единоборства", "карате", "дзюдо", "борьба", "martial arts", "karate", "judo", "wrestling")),
+    ("Футбол", 7.0, ("футбол", "soccer", "football")),
+    ("Баскетбол", 6.5, ("баскетбол", "basketball")),
+    ("Волейбол", 4.0, ("волейбол", "volleyball")),
+    ("Теннис", 7.3, ("теннис", "большой теннис", "tennis")),
+    ("Настольный теннис", 4.0, ("настольный теннис", "пинг понг", "table tennis", "ping pong")),
+    ("Бадминтон", 5.5, ("бадминтон", "badminton")),
+    ("Хоккей", 8.0, ("хоккей", "hockey", "ice hockey")),
+    ("Лыжи", 9.0, ("лыжи", "беговые лыжи", "cross country skiing", "skiing")),
+    ("Горные лыжи", 5.3, ("горные лыжи", "сноуборд", "downhill skiing", "snowboarding")),
+    ("Коньки", 5.5, ("коньки", "катание на коньках", "ice skating", "skating")),
+    ("Скакалка", 11.8, ("скакалка", "прыжки на скакалке", "jump rope", "rope jumping")),
+    ("Гребля", 7.0, ("гребля", "гребной тренажер", "rowing")),
+    ("Эллипс", 5.0, ("эллипс", "эллиптический тренажер", "elliptical")),
+    ("Скалолазание", 8.0, ("скалолазание", "боулдеринг", "climbing", "rock climbing", "bouldering")),
+    ("Ходьба по лестнице", 8.8, ("лестница", "ходьба по лестнице", "stair climbing", "stairs")),
+    ("Туризм", 6.0, ("туризм", "поход", "хайкинг", "hiking")),
+)
+
+
+def normalize_activity(name: str) -> str:
+    return " ".join(name.casefold().replace("ё", "е").replace("-", " ").split())
+
+
+_ALIASES: Dict[str, Tuple[str, float]] = {
+    normalize_activity(alias): (title, met)
+    for title, met, aliases in ACTIVITIES
+    for alias in aliases
+}
+
+
+def find_activity(name: str) -> Optional[Tuple[str, float]]:
+    return _ALIASES.get(normalize_activity(name))
+
+
+def calories_burned(met: float, duration_minutes: float, weight_kg: float) -> float:
+    return met * weight_kg * duration_minutes / 60
+
+
+def calories_burned_batch(
+    mets: "Sequence[float] | np.ndarray",
+    durations_minutes: "Sequence[float] | np.ndarray",
+    weights_kg: "Sequence[float] | np.ndarray"
+) -> "np.ndarray":
+    import numpy as np
+
+    mets = np.asarray(mets, dtype=np.float64)
+    durations_minutes = np.asarray(durations_minutes, dtype=np.float64)
+    weights_kg = np.asarray(weights_kg, dtype=np.float64)
+    return mets * weights_kg * durations_minutes / 60
+
+
+def calories_burned_for_activities(
+    activities: Iterable[str],
+    durations_minutes: "Sequence[float] | np.ndarray",
+    weights_kg: "Sequence[float] | np.ndarray"
+) -> "np.ndarray":
+    import numpy as np
+
+    # Для неизвестных активностей результат NaN
+    mets = np.fromiter(
+        ((find_activity(name) or (None, np.nan))[1] for name in activities),
+        dtype=np.float64
+    )
+    return calories_burned_batch(mets, durations_minutes, weights_kg)
@@ -1,9 +1,33 @@
-import requests
+import asyncio
+import logging
+from pathlib import Path
+
+import aiohttp
+
+from app.settings.config import config
+from app.services.food_index import FoodIndex
+from app.services.http_client import http_client
+from app.services.upstream_limits import upstream_limits
+from app.utils.metrics import metrics
 from app.services.translation_service import TranslationService
 from typing import Optional, Dict
 
 
-__all__ = ["NutritionService"]
+__all__ = ["NutritionService", "load_food_index"]
+
+
+logger = logging.getLogger(__name__)
+
+
+food_index = FoodIndex()
+
+
+async def load_food_index():
+    global food_index
+
+    if not Path(config.food_index_path).exists():
+        return
+    food_index = await asyncio.to_thread(FoodIndex.load, config.food_index_path)
 
 
 class NutritionService:
@@ -11,16 +35,38 @@ class NutritionService:
         self.translation_service = TranslationService()
 
     async def get_nutrition_info(self, product_name: str) -> Optional[Dict[str, str | float]]:
-        translated_query = self.translation_service.translate_to_english(product_name)
+        match = food_index.lookup(product_name)
+        if match:
+            return {
+                'name': product_name,
+                'calories': round(match[1], 1)
+            }
+
+        translated_query = await self.translation_service.translate_to_english(product_name)
 
-        url = f"https://world.openfoodfacts.org/cgi/search.pl?action=process&search_terms={translated_query}&json=true"
-        response = requests.get(url)
+        match = food_index.lookup(translated_query)
+        if match:
+            return {
+                'name': product_name,
+                'calories': round(match[1], 1)
+            }
+
+        upstream_limits.require("nutrition")
+
+        try:
+            with metrics.track("upstream_request_seconds", upstream="nutrition"):
+                status, data = await http_client.get_json(
+                    f"{config.open_food_facts_url}/cgi/search.pl",
+                    params={"action": "process", "search_terms": translated_query, "json": "true"}
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Ошибка при запросе к OpenFoodFacts: %s", e, extra={"upstream": "nutrition"})
+            return None
 
-        if response.status_code != 200:
-            print(f"Ошибка: {response.status_code}")
+        if status != 200:
+            logger.warning("Ошибка: %s", status, extra={"upstream": "nutrition", "status": status})
             return None
 
-        data = response.json()
         products = data.get('products', [])
 
         if not products:
@@ -32,4 +78,4 @@ class NutritionService:
         return {
             'name': product_name,
             'calories': calories
-        }
\ No newline at end of file
+        }
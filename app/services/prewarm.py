@@ -0,0 +1,58 @@
+import asyncio
+import importlib
+import logging
+import time
+from typing import Optional
+
+from app.services.chart_service import chart_service
+from app.services.nutrition_cal_service import load_food_index
+from app.services.translation_service import warm_translation_cache
+
+
+__all__ = ["HEAVY_MODULES", "prewarm", "start_prewarm", "stop_prewarm"]
+
+
+logger = logging.getLogger(__name__)
+
+
+# Модули, которые грузятся лениво при первом обращении
+HEAVY_MODULES = ("numpy", "googletrans")
+
+_task: Optional[asyncio.Task] = None
+
+
+def _import_heavy_modules():
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("Не удалось загрузить %s: %s", name, e)
+
+
+async def prewarm():
+    started = time.perf_counter()
+    await warm_translation_cache()
+    await load_food_index()
+    await asyncio.to_thread(_import_heavy_modules)
+    await chart_service.warm()
+    logger.info("Prewarm finished", extra={"seconds": round(time.perf_counter() - started, 3)})
+
+
+async def _run_prewarm():
+    try:
+        await prewarm()
+    except Exception:
+        logger.exception("Prewarm failed")
+
+
+async def start_prewarm():
+    # Вызывается из startup-хука: сама загрузка идёт фоном, пока бот уже принимает апдейты
+    global _task
+
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run_prewarm())
+
+
+async def stop_prewarm():
+    if _task is not None and not _task.done():
+        _task.cancel()
@@ -0,0 +1,50 @@
+from typing import NamedTuple, Optional
+
+from app.db.db import get_async_db
+from app.models.user import User
+from app.settings.config import config
+from app.utils.ttl_cache import TTLCache
+
+
+__all__ = ["ProfileSnapshot", "profile_cache", "get_profile", "invalidate_profile"]
+
+
+class ProfileSnapshot(NamedTuple):
+    user_id: int
+    weight: float
+    height: float
+    age: int
+    city: str
+    water_level: float
+    calorie_level: float
+
+
+profile_cache = TTLCache(
+    maxsize=config.profile_cache_size,
+    ttl=config.profile_cache_ttl
+)
+
+
+async def _load_profile(user_id: int) -> Optional[ProfileSnapshot]:
+    async with get_async_db() as db:
+        user = await db.get(User, user_id)
+    if user is None:
+        return None
+    return ProfileSnapshot(
+        user_id=user.user_id,
+        weight=user.weight,
+        height=user.height,
+        age=user.age,
+        city=user.city,
+        water_level=user.water_level,
+        calorie_level=user.calorie_level
+    )
+
+
+async def get_profile(user_id: int) -> Optional[ProfileSnapshot]:
+    # Отсутствие профиля тоже кешируется, поэтому его создание обязано инвалидировать кеш
+    return await profile_cache.get_or_load(user_id, lambda: _load_profile(user_id), cache_none=True)
+
+
+def invalidate_profile(user_id: int):
+    profile_cache.invalidate(user_id)
@@ -1,25 +1,98 @@
-from googletrans import Translator
+import asyncio
+import logging
+import threading
+from typing import Optional
 
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
 
-__all__ = ['TranslationService']
+from app.db.db import get_async_db
+from app.models.translation import Translation
+from app.settings.config import config
+from app.services.upstream_limits import upstream_limits
+from app.utils.metrics import metrics
+from app.utils.ttl_cache import TTLCache
+
+
+__all__ = ['TranslationService', 'translation_cache', 'warm_translation_cache']
+
+
+logger = logging.getLogger(__name__)
+
+
+translation_cache = TTLCache(maxsize=config.translation_cache_size)
+
+_local = threading.local()
+
+
+def get_translator():
+    # googletrans работает синхронно, поэтому у каждого потока свой клиент
+    translator = getattr(_local, "translator", None)
+    if translator is None:
+        from googletrans import Translator
+        translator = _local.translator = Translator()
+    return translator
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+async def warm_translation_cache():
+    async with get_async_db() as db:
+        rows = await db.execute(
+            select(Translation.src, Translation.dest, Translation.text, Translation.translated)
+            .limit(translation_cache.maxsize)
+        )
+        for src, dest, text, translated in rows:
+            translation_cache.set((src, dest, text), translated)
 
 
 class TranslationService:
-    def __init__(self):
-        self.translator = Translator()
+    async def translate(self, text: str, src: str, dest: str) -> str:
+        key = (src, dest, normalize_text(text))
+        translated = await translation_cache.get_or_load(
+            key,
+            lambda: self._load(key, text)
+        )
+        return translated or text
 
-    def translate_to_english(self, text: str) -> str:
-        try:
-            translated = self.translator.translate(text, src='ru', dest='en')
-            return translated.text
-        except Exception as e:
-            print(f"Ошибка перевода на английский: {e}")
-            return text
+    async def _load(self, key: tuple[str, str, str], text: str) -> Optional[str]:
+        src, dest, normalized = key
+
+        async with get_async_db() as db:
+            translated = await db.scalar(
+                select(Translation.translated).where(
+                    Translation.src == src,
+                    Translation.dest == dest,
+                    Translation.text == normalized
+                )
+            )
+        if translated is not None:
+            return translated
+
+        # Без перевода вызывающий код получит исходный текст, в кэш пропуск не попадёт
+        if not upstream_limits.try_acquire("translation"):
+            return None
 
-    def translate_to_russian(self, text: str) -> str:
         try:
-            translated = self.translator.translate(text, src='en', dest='ru')
-            return translated.text
+            with metrics.track("upstream_request_seconds", upstream="translation"):
+                result = await asyncio.to_thread(get_translator().translate, text, src=src, dest=dest)
         except Exception as e:
-            print(f"Ошибка перевода на русский: {e}")
-            return text
\ No newline at end of file
+            logger.warning("Ошибка перевода %s -> %s: %s", src, dest, e, extra={"upstream": "translation"})
+            return None
+
+        async with get_async_db() as db:
+            await db.execute(
+                insert(Translation)
+                .values(src=src, dest=dest, text=normalized, translated=result.text)
+                .on_conflict_do_nothing()
+            )
+            await db.commit()
+        return result.text
+
+    async def translate_to_english(self, text: str) -> str:
+        return await self.translate(text, src='ru', dest='en')
+
+    async def translate_to_russian(self, text: str) -> str:
+        return await self.translate(text, src='en', dest='ru')
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from typing import Dict, Tuple
+
+from app.settings.config import config
+from app.utils.token_bucket import TokenBucket
+
+
+__all__ = ["UpstreamThrottled", "UpstreamLimits", "upstream_limits"]
+
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamThrottled(Exception):
+    # Лимит внешнего API исчерпан: это не «ничего не найдено», пользователю стоит повторить позже
+    def __init__(self, upstream: str):
+        super().__init__(f"{upstream} is throttled")
+        self.upstream = upstream
+
+
+class UpstreamLimits:
+    def __init__(self, limits: Dict[str, Tuple[float, float]], enabled: bool = True):
+        self.enabled = enabled
+        self._buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in limits.items()}
+        self.allowed = dict.fromkeys(limits, 0)
+        self.throttled = dict.fromkeys(limits, 0)
+
+    def try_acquire(self, upstream: str) -> bool:
+        if not self.enabled or self._buckets[upstream].try_acquire():
+            self.allowed[upstream] += 1
+            return True
+
+        self.throttled[upstream] += 1
+        logger.warning("Превышен лимит запросов к %s", upstream, extra={"upstream": upstream})
+        return False
+
+    def require(self, upstream: str):
+        if not self.try_acquire(upstream):
+            raise UpstreamThrottled(upstream)
+
+    async def acquire(self, upstream: str):
+        # Для фоновых задач: ждём токен вместо отказа
+        bucket = self._buckets[upstream]
+        while self.enabled and not bucket.try_acquire():
+            await asyncio.sleep(bucket.wait_time())
+        self.allowed[upstream] += 1
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"allowed": self.allowed[name], "throttled": self.throttled[name]}
+            for name in self._buckets
+        }
+
+
+upstream_limits = UpstreamLimits(
+    {
+        "weather": (config.rate_limit_weather_rate, config.rate_limit_weather_burst),
+        # Ночной пересчёт норм ходит за погодой со своим лимитом и не выбирает токены пользователей
+        "weather_background": (config.rate_limit_weather_background_rate, config.rate_limit_weather_background_burst),
+        "nutrition": (config.rate_limit_nutrition_rate, config.rate_limit_nutrition_burst),
+        "workout": (config.rate_limit_workout_rate, config.rate_limit_workout_burst),
+        "translation": (config.rate_limit_translation_rate, config.rate_limit_translation_burst),
+    },
+    enabled=config.rate_limit_enabled
+)
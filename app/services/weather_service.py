@@ -1,14 +1,65 @@
-import requests
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import aiohttp
+
 from app.settings.config import config
+from app.services.http_client import http_client
+from app.services.upstream_limits import upstream_limits
+from app.utils.metrics import metrics
+from app.utils.ttl_cache import TTLCache
+
+
+__all__ = ["WeatherService", "weather_cache"]
+
+
+logger = logging.getLogger(__name__)
+
+
+weather_cache = TTLCache(
+    maxsize=config.weather_cache_size,
+    ttl=config.weather_cache_ttl
+)
+
+
+def normalize_city(city: str) -> str:
+    return " ".join(city.split()).casefold().replace("ё", "е")
 
 
 class WeatherService:
     def __init__(self):
         self.api_key = config.api_key_open_weather.get_secret_value()
 
-    def get_temperature(self, city: str) -> float:
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&units=metric&appid={self.api_key}"
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.json()['main']['temp']
-        return None
\ No newline at end of file
+    async def get_temperature(self, city: str, background: bool = False) -> Optional[float]:
+        # Температура из кэша переиспользуется и фоновыми задачами, лимит тратится только на промахи
+        return await weather_cache.get_or_load(
+            normalize_city(city),
+            lambda: self._fetch_temperature(city, background)
+        )
+
+    async def _fetch_temperature(self, city: str, background: bool = False) -> Optional[float]:
+        if background:
+            await upstream_limits.acquire("weather_background")
+        else:
+            upstream_limits.require("weather")
+        return await self._request_temperature(city)
+
+    @metrics.timed("upstream_request_seconds", upstream="weather")
+    async def _request_temperature(self, city: str) -> Optional[float]:
+        try:
+            status, data = await http_client.get_json(
+                f"{config.open_weather_url}/data/2.5/weather",
+                params={"q": city, "units": "metric", "appid": self.api_key}
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Ошибка при запросе погоды: %s", e, extra={"upstream": "weather"})
+            return None
+
+        if status == 200:
+            return data['main']['temp']
+        return None
+
+    @staticmethod
+    def cache_stats() -> Dict[str, float]:
+        return weather_cache.stats
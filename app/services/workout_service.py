@@ -1,41 +1,82 @@
-import requests
+import asyncio
+import logging
 from typing import Optional, List, Dict
 
 from app.settings.config import config
+from app.services.http_client import http_client
+from app.services.upstream_limits import upstream_limits
+from app.utils.metrics import metrics
+from app.services.met_table import find_activity, calories_burned
 from app.services.translation_service import TranslationService
 
 
 __all__ = ['WorkoutService']
 
 
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_WEIGHT_KG = 70.0
+
+
 class WorkoutService:
     def __init__(self):
         self.translation_service = TranslationService()
 
-    def get_calories_burned(self, activity: str, duration: int) -> Optional[List[Dict[str, float]]]:
-        try:
-            translated_activity = self.translation_service.translate_to_english(activity)
+    async def get_calories_burned(
+        self,
+        activity: str,
+        duration: int,
+        weight: Optional[float] = None
+    ) -> Optional[List[Dict[str, float]]]:
+        weight = weight or DEFAULT_WEIGHT_KG
 
-            print(translated_activity)
+        match = find_activity(activity)
+        if match:
+            name, met = match
+            return [{
+                'name': name,
+                'calories_per_hour': calories_burned(met, 60, weight),
+                'total_calories': calories_burned(met, duration, weight)
+            }]
 
-            response = requests.get(
-                f"https://api.api-ninjas.com/v1/caloriesburned?activity={translated_activity}",
-                headers={'X-Api-Key': config.api_key_nutrition_training.get_secret_value()}
-            )
+        return await self._get_calories_burned_remote(activity, duration, weight)
 
-            if response.status_code == 200:
-                data = response.json()
+    async def _get_calories_burned_remote(
+        self,
+        activity: str,
+        duration: int,
+        weight: float
+    ) -> Optional[List[Dict[str, float]]]:
+        upstream_limits.require("workout")
 
-                for item in data:
+        try:
+            translated_activity = await self.translation_service.translate_to_english(activity)
+
+            with metrics.track("upstream_request_seconds", upstream="workout"):
+                status, data = await http_client.get_json(
+                    f"{config.api_ninjas_url}/v1/caloriesburned",
+                    params={
+                        "activity": translated_activity,
+                        # api-ninjas принимает вес в фунтах в диапазоне 50-500
+                        "weight": str(min(max(round(weight * 2.20462), 50), 500))
+                    },
+                    headers={'X-Api-Key': config.api_key_nutrition_training.get_secret_value()}
+                )
+
+            if status == 200:
+                names = await asyncio.gather(
+                    *(self.translation_service.translate_to_russian(item['name']) for item in data)
+                )
+                for item, name in zip(data, names):
                     calories_per_hour = item.get('calories_per_hour', 0)
 
                     item['total_calories'] = (calories_per_hour / 60) * duration
 
-                    item['name'] = self.translation_service.translate_to_russian(item['name'])
+                    item['name'] = name
                 return data
 
             return None
         except Exception as e:
-            print(f"Ошибка при запросе к API: {e}")
+            logger.warning("Ошибка при запросе к API: %s", e, extra={"upstream": "workout"})
             return None
-
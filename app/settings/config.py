@@ -1,5 +1,7 @@
 from pydantic_settings import SettingsConfigDict, BaseSettings
 from pydantic import SecretStr
+from datetime import time
+from typing import List, Literal, Optional
 
 from app.utils.find_directory import find_directory_root
 
@@ -12,6 +14,101 @@ class Settings(BaseSettings):
     api_key_open_weather: SecretStr
     api_key_nutrition_training: SecretStr
 
+    bot_mode: Literal["polling", "webhook"] = "polling"
+    telegram_api_url: Optional[str] = None
+    webhook_base_url: Optional[str] = None
+    webhook_path: str = "/webhook"
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8000
+    webhook_secret: Optional[SecretStr] = None
+    max_concurrent_updates: int = 100
+    shutdown_drain_timeout: float = 30.0
+
+    workers: int = 1
+    worker_index: Optional[int] = None
+    worker_host: str = "127.0.0.1"
+    worker_base_port: int = 8100
+    worker_queue_size: int = 1000
+    worker_start_timeout: float = 60.0
+    worker_health_interval: float = 5.0
+    worker_health_failures: int = 3
+
+    fsm_storage: Literal["memory", "sqlite"] = "sqlite"
+    fsm_flush_delay: float = 0.05
+    fsm_cache_size: int = 10000
+    fsm_cache_ttl: Optional[float] = 300.0
+
+    open_weather_url: str = "http://api.openweathermap.org"
+    open_food_facts_url: str = "https://world.openfoodfacts.org"
+    api_ninjas_url: str = "https://api.api-ninjas.com"
+
+    http_timeout: float = 10.0
+    http_connect_timeout: float = 3.0
+    http_pool_size: int = 100
+    http_pool_size_per_host: int = 20
+    http_keepalive_timeout: float = 30.0
+
+    weather_cache_ttl: float = 1800.0
+    weather_cache_size: int = 1024
+
+    translation_cache_size: int = 10000
+
+    food_index_path: str = './food_index.db'
+
+    chart_workers: int = 2
+    chart_queue_size: int = 32
+    chart_timeout: float = 15.0
+    chart_cache_size: int = 10000
+    chart_cache_max_bytes: int = 32 * 1024 * 1024
+    chart_cache_spill_dir: Optional[str] = None
+    chart_cache_spill_max_bytes: int = 256 * 1024 * 1024
+
+    profile_cache_size: int = 100000
+    profile_cache_ttl: float = 600.0
+
+    goal_refresh_enabled: bool = True
+    goal_refresh_time: time = time(3, 0)
+    goal_refresh_chunk_size: int = 50000
+    goal_refresh_concurrency: int = 10
+
+    write_behind_enabled: bool = False
+    write_behind_interval_ms: int = 200
+    write_behind_max_events: int = 100
+    activity_compaction_batch_size: int = 1000
+
+    rate_limit_enabled: bool = True
+    rate_limit_user_rate: float = 1.0
+    rate_limit_user_burst: int = 5
+    rate_limit_user_keys: int = 100000
+    rate_limit_weather_rate: float = 1.0
+    rate_limit_weather_burst: int = 20
+    rate_limit_weather_background_rate: float = 5.0
+    rate_limit_weather_background_burst: int = 10
+    rate_limit_nutrition_rate: float = 1.5
+    rate_limit_nutrition_burst: int = 20
+    rate_limit_workout_rate: float = 0.2
+    rate_limit_workout_burst: int = 10
+    rate_limit_translation_rate: float = 2.0
+    rate_limit_translation_burst: int = 20
+
+    log_level: str = "INFO"
+    log_format: Literal["json", "text"] = "json"
+    log_queue_size: int = 10000
+    log_message_sample_rate: float = 1.0
+
+    metrics_host: str = "127.0.0.1"
+    metrics_port: Optional[int] = None
+    admin_ids: List[int] = []
+
+    prewarm_enabled: bool = True
+
+    export_chunk_size: int = 1000
+
+    db_path: str = './fitness.db'
+    db_async: bool = True
+    db_wal: bool = True
+    db_busy_timeout_ms: int = 30000
+
     model_config = SettingsConfigDict(
         env_file='.env',
         env_file_encoding='utf-8'
@@ -1,33 +1,137 @@
 from aiogram import BaseMiddleware
-from aiogram.types import Message
-from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import TelegramObject, Message, CallbackQuery
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, Any, Awaitable, Optional
+import atexit
+import copy
+import json
 import logging
+import queue
+import random
+import time
 
+from app.settings.config import config
 
-__all__ = ["UserActionLoggerMiddleware"]
 
+__all__ = ["UserActionLoggerMiddleware", "JsonFormatter", "setup_logging"]
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-    ]
-)
+
+# Атрибуты, которые есть у любой записи; всё остальное пришло через extra
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Трассировку сохраняем отдельным полем, а не склеиваем с текстом сообщения
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # Если писатель не успевает, теряем запись, но не блокируем цикл событий
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging() -> DroppingQueueHandler:
+    global _listener
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(
+        JsonFormatter() if config.log_format == "json"
+        else logging.Formatter("%(asctime)s - %(message)s")
+    )
+
+    handler = DroppingQueueHandler(queue.Queue(config.log_queue_size))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(config.log_level)
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return handler
+
+
+queue_handler = setup_logging()
 
 
 logger = logging.getLogger(__name__)
 
 
 class UserActionLoggerMiddleware(BaseMiddleware):
+    def __init__(self, sample_rate: float = 1.0):
+        self.sample_rate = sample_rate
+
     async def __call__(
         self,
-        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
-        event: Message,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        if event.text and event.text.startswith("/"):
-            logger.info(f"User {event.from_user.id} issued command: {event.text}")
-        elif event.text:
-            logger.info(f"User {event.from_user.id} sent message: {event.text}")
-        return await handler(event, data)
\ No newline at end of file
+        if isinstance(event, Message):
+            action, payload = ("command", event.text) if event.text and event.text.startswith("/") else ("message", event.text)
+        elif isinstance(event, CallbackQuery):
+            action, payload = "callback", event.data
+        else:
+            action, payload = "update", None
+
+        # Обычные сообщения пишем выборочно, команды и ошибки - всегда
+        sampled = action != "message" or random.random() < self.sample_rate
+
+        started = time.perf_counter()
+        try:
+            result = await handler(event, data)
+        except Exception:
+            logger.exception("Handler failed", extra=self._fields(action, payload, data, started))
+            raise
+
+        if sampled:
+            logger.info("User action", extra=self._fields(action, payload, data, started))
+        return result
+
+    @staticmethod
+    def _fields(action: str, payload: Optional[str], data: Dict[str, Any], started: float) -> Dict[str, Any]:
+        user = data.get("event_from_user")
+        handler_object = data.get("handler")
+        return {
+            "user_id": user.id if user else None,
+            "action": action,
+            "text": payload,
+            "handler": getattr(getattr(handler_object, "callback", None), "__name__", None),
+            "state": data.get("raw_state"),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
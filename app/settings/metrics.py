@@ -0,0 +1,78 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from typing import Callable, Dict, Any, Awaitable, Iterable, Optional
+
+from app.utils.metrics import metrics
+
+
+__all__ = ["MetricsMiddleware", "register_default_collectors"]
+
+
+class MetricsMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        try:
+            with metrics.track("bot_handler_seconds", handler=name):
+                return await handler(event, data)
+        except Exception:
+            metrics.inc("bot_handler_errors_total", handler=name)
+            raise
+
+
+def _stats_samples(prefix: str, stats: Dict[str, float], **labels: Any) -> Iterable:
+    return [(f"{prefix}_{field}", labels, value) for field, value in stats.items()]
+
+
+def register_default_collectors(limiter=None, rate_limiter=None, storage=None):
+    from app.services.activity_log import activity_logger
+    from app.services.chart_cache import chart_cache
+    from app.services.chart_service import chart_service
+    from app.services.profile_cache import profile_cache
+    from app.services.translation_service import translation_cache
+    from app.services.upstream_limits import upstream_limits
+    from app.services.weather_service import weather_cache
+    from app.settings.logging import queue_handler
+
+    def collect_caches():
+        caches: Dict[str, Optional[Dict[str, float]]] = {
+            "weather": weather_cache.stats,
+            "translation": translation_cache.stats,
+            "profile": profile_cache.stats,
+            "chart": chart_cache.stats,
+            "fsm": getattr(storage, "stats", None),
+        }
+        return [
+            sample
+            for cache, stats in caches.items() if stats is not None
+            for sample in _stats_samples("cache", stats, cache=cache)
+        ]
+
+    def collect_in_flight():
+        samples = [
+            ("chart_render_pending", {}, chart_service.pending),
+            ("log_records_dropped", {}, queue_handler.dropped),
+        ]
+        if limiter is not None:
+            samples.append(("bot_updates_in_flight", {}, limiter.in_flight))
+        samples.extend(_stats_samples("activity_log", activity_logger.stats))
+        return samples
+
+    def collect_rate_limits():
+        samples = [
+            sample
+            for upstream, stats in upstream_limits.stats.items()
+            for sample in _stats_samples("upstream_rate_limit", stats, upstream=upstream)
+        ]
+        if rate_limiter is not None:
+            samples.extend(_stats_samples("user_rate_limit", rate_limiter.stats))
+        return samples
+
+    metrics.register_collector(collect_caches)
+    metrics.register_collector(collect_in_flight)
+    metrics.register_collector(collect_rate_limits)
@@ -0,0 +1,45 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Message, CallbackQuery
+from typing import Callable, Dict, Any, Awaitable
+
+from app.services.upstream_limits import UpstreamThrottled
+from app.utils.token_bucket import KeyedRateLimiter
+
+
+__all__ = ["RateLimitMiddleware"]
+
+
+THROTTLED_TEXT = "⏳ Слишком много запросов. Подождите немного и попробуйте снова."
+
+
+class RateLimitMiddleware(BaseMiddleware):
+    def __init__(self, rate: float, burst: float, maxsize: int, notice_interval: float = 10.0):
+        self.limiter = KeyedRateLimiter(rate, burst, maxsize)
+        # Предупреждаем не чаще раза в notice_interval, чтобы не отвечать на каждый спам
+        self._notices = KeyedRateLimiter(1 / notice_interval, 1, maxsize)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or self.limiter.try_acquire(user.id):
+            try:
+                return await handler(event, data)
+            except UpstreamThrottled:
+                # Исчерпан лимит внешнего API: отвечаем так же, как при личном лимите,
+                # а состояние диалога не трогаем, чтобы можно было просто повторить ввод
+                await event.answer(THROTTLED_TEXT)
+                return None
+
+        if isinstance(event, CallbackQuery):
+            await event.answer(THROTTLED_TEXT)
+        elif isinstance(event, Message) and self._notices.try_acquire(user.id):
+            await event.answer(THROTTLED_TEXT)
+        return None
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {**self.limiter.stats, "notices": self._notices.allowed}
@@ -0,0 +1,18 @@
+import hashlib
+import hmac
+
+from app.settings.config import config
+
+
+__all__ = ["SECRET_HEADER", "worker_secret"]
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def worker_secret() -> str:
+    # Один секрет для супервизора, воркеров и CLI: заданный WEBHOOK_SECRET,
+    # а без него — производный от токена бота, который известен каждому процессу
+    if config.webhook_secret:
+        return config.webhook_secret.get_secret_value()
+    return hmac.new(config.token_bot.get_secret_value().encode(), b"workers", hashlib.sha256).hexdigest()
@@ -0,0 +1,75 @@
+import builtins
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+
+__all__ = ["StartupProfiler", "startup_profiler"]
+
+
+def _group(name: str) -> str:
+    # Собственные модули разбиваем по подпакетам, сторонние - по корневому пакету
+    parts = name.split(".")
+    return ".".join(parts[:2]) if parts[0] == "app" else parts[0]
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports: Dict[str, float] = defaultdict(float)
+        self.phases: List[Tuple[str, float]] = []
+        self._stack: List[float] = []
+        self._original_import = None
+
+    def install_import_hook(self):
+        if self._original_import is not None:
+            return
+        self._original_import = original = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level:
+                return original(name, globals, locals, fromlist, level)
+
+            started = time.perf_counter()
+            self._stack.append(0.0)
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                elapsed = time.perf_counter() - started
+                nested = self._stack.pop()
+                self.imports[_group(name)] += elapsed - nested
+                if self._stack:
+                    self._stack[-1] += elapsed
+
+        builtins.__import__ = timed_import
+
+    def uninstall_import_hook(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self, top: int = 15) -> str:
+        total = time.perf_counter() - self.started
+        lines = [f"Startup: {total * 1000:.0f} ms until ready"]
+
+        if self.imports:
+            lines.append(f"Imports: {sum(self.imports.values()) * 1000:.0f} ms")
+            for name, seconds in sorted(self.imports.items(), key=lambda item: -item[1])[:top]:
+                lines.append(f"  {name:<32} {seconds * 1000:8.1f} ms")
+
+        lines.append("Init:")
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<32} {seconds * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+startup_profiler = StartupProfiler()
@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable
+
+
+__all__ = ["TokenBucket", "KeyedRateLimiter"]
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        return max(tokens - self.tokens, 0.0) / self.rate
+
+
+class KeyedRateLimiter:
+    def __init__(self, rate: float, burst: float, maxsize: int):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+        self.allowed = 0
+        self.throttled = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def try_acquire(self, key: Hashable, tokens: float = 1.0) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            # Вытесняем давно неактивные корзины: их токены всё равно уже восстановились
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        if bucket.try_acquire(tokens):
+            self.allowed += 1
+            return True
+        self.throttled += 1
+        return False
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "throttled": self.throttled
+        }
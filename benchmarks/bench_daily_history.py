@@ -0,0 +1,153 @@
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+
+SCHEMA = """
+CREATE TABLE daily_data (
+    daily_data_id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    date DATE NOT NULL,
+    logged_water FLOAT,
+    logged_calories FLOAT,
+    burned_calories FLOAT
+)
+"""
+
+HISTORY_SQL = """
+SELECT date,
+       coalesce(logged_water, 0.0),
+       coalesce(logged_calories, 0.0),
+       coalesce(burned_calories, 0.0)
+FROM daily_data
+WHERE user_id = ? AND date >= ? AND date <= ?
+ORDER BY date
+"""
+
+
+def populate(conn: sqlite3.Connection, rows: int, days: int):
+    users = max(rows // days, 1)
+    start = date.today() - timedelta(days=days - 1)
+    day_strings = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    rnd = random.Random(1)
+
+    def generate():
+        # Строки перемешаны по пользователям, как при реальной записи «по дням»
+        for day in day_strings:
+            for user_id in range(users):
+                yield user_id, day, rnd.uniform(0, 3000), rnd.uniform(0, 3000), rnd.uniform(0, 800)
+
+    conn.executemany(
+        "INSERT INTO daily_data (user_id, date, logged_water, logged_calories, burned_calories) VALUES (?, ?, ?, ?, ?)",
+        generate()
+    )
+    conn.commit()
+    return users
+
+
+def fetch_columnar(conn: sqlite3.Connection, user_id: int, start: str, end: str):
+    rows = conn.execute(HISTORY_SQL, (user_id, start, end)).fetchall()
+    if not rows:
+        return None
+    dates, water, calories, burned = zip(*rows)
+    return (
+        np.array(dates, dtype="datetime64[D]"),
+        np.array(water),
+        np.array(calories),
+        np.array(burned)
+    )
+
+
+def time_queries(conn: sqlite3.Connection, users: int, span: int, queries: int) -> list:
+    rnd = random.Random(2)
+    end = date.today()
+    start = (end - timedelta(days=span)).isoformat()
+    timings = []
+    for _ in range(queries):
+        started = time.perf_counter()
+        fetch_columnar(conn, rnd.randrange(users), start, end.isoformat())
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def time_writes(conn: sqlite3.Connection, users: int, writes: int) -> list:
+    # Запись дня как в increment_daily_data: обновление сумм по (user_id, date)
+    rnd = random.Random(3)
+    day = date.today().isoformat()
+    timings = []
+    for _ in range(writes):
+        started = time.perf_counter()
+        conn.execute(
+            "UPDATE daily_data SET logged_water = logged_water + ?, logged_calories = logged_calories + ? "
+            "WHERE user_id = ? AND date = ?",
+            (rnd.uniform(0, 500), rnd.uniform(0, 500), rnd.randrange(users), day)
+        )
+        conn.commit()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+    print(f"{label:<32} median {statistics.median(timings):9.3f} ms   p95 {p95:9.3f} ms   ({len(timings)} queries)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--scan-queries", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--db", default=None, help="Keep the generated database at this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.db or Path(tmp) / "history.db")
+        path.unlink(missing_ok=True)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(SCHEMA)
+
+        started = time.perf_counter()
+        users = populate(conn, args.rows, args.days)
+        print(f"populated {args.rows} rows for {users} users in {time.perf_counter() - started:.1f}s, "
+              f"{path.stat().st_size / 2**20:.0f} MiB")
+
+        report("no index, 30 days", time_queries(conn, users, 30, args.scan_queries))
+
+        # Уникальный индекс есть в схеме всегда, сравниваем покрывающий именно с ним
+        conn.execute("CREATE UNIQUE INDEX uq_daily_data_user_date ON daily_data (user_id, date)")
+        conn.execute("ANALYZE daily_data")
+        report("unique index, 30 days", time_queries(conn, users, 30, args.queries))
+        report("unique index, 365 days", time_queries(conn, users, 365, args.queries))
+        report("unique index, day writes", time_writes(conn, users, args.writes))
+
+        started = time.perf_counter()
+        conn.execute(
+            "CREATE INDEX ix_daily_data_user_date_cover "
+            "ON daily_data (user_id, date, logged_water, logged_calories, burned_calories)"
+        )
+        conn.execute("ANALYZE daily_data")
+        print(f"covering index built in {time.perf_counter() - started:.1f}s")
+        plan = conn.execute("EXPLAIN QUERY PLAN " + HISTORY_SQL, (1, "2000-01-01", "2100-01-01")).fetchall()
+        print(f"plan: {plan[0][-1]}")
+
+        report("covering index, 30 days", time_queries(conn, users, 30, args.queries))
+        report("covering index, 365 days", time_queries(conn, users, 365, args.queries))
+        report("covering index, day writes", time_writes(conn, users, args.writes))
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
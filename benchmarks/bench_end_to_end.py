@@ -0,0 +1,262 @@
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.cli.fake_telegram import FakeTelegramApi, make_callback_update, make_message_update  # noqa: E402
+
+
+FOODS = ["яблоко", "гречка", "творог", "банан", "овсянка", "курица", "рис", "сыр"]
+WORKOUTS = ["бег", "плавание", "велосипед", "йога", "кроссфит", "скалолазание"]
+
+Step = Tuple[str, str]
+
+FLOWS: Dict[str, Callable[[random.Random], List[Step]]] = {
+    "profile": lambda rnd: [
+        ("message", "/start"),
+        ("callback", "set_profile"),
+        ("message", str(rnd.randint(50, 110))),
+        ("message", str(rnd.randint(150, 200))),
+        ("message", str(rnd.randint(18, 70))),
+        ("message", str(rnd.randint(0, 120))),
+        ("message", rnd.choice(["Москва", "Казань", "Сочи", "Новосибирск"])),
+    ],
+    "water": lambda rnd: [
+        ("callback", "worker"),
+        ("callback", "log_water"),
+        ("message", str(rnd.randint(100, 500))),
+    ],
+    "food": lambda rnd: [
+        ("callback", "log_food"),
+        ("message", rnd.choice(FOODS)),
+        ("message", str(rnd.randint(50, 400))),
+    ],
+    "workout": lambda rnd: [
+        ("callback", "log_workout"),
+        ("message", rnd.choice(WORKOUTS)),
+        ("message", str(rnd.randint(10, 90))),
+    ],
+    "progress": lambda rnd: [
+        ("callback", "progress"),
+        ("callback", "daily_statistics"),
+    ],
+    "graphs": lambda rnd: [
+        ("callback", "statistics"),
+        ("callback", "daily_progress_graph"),
+        ("callback", "monthly_progress_graph"),
+    ],
+    "rollups": lambda rnd: [
+        ("callback", rnd.choice(["rollup_statistics_3", "rollup_statistics_6", "rollup_statistics_12"])),
+        ("callback", "achievements"),
+    ],
+}
+
+ACTIVITY_WEIGHTS = {"water": 5, "food": 3, "workout": 2, "progress": 2, "graphs": 1, "rollups": 1}
+
+
+class Upstream:
+    def __init__(self, latency: float, jitter: float, error_rate: float, seed: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rnd = random.Random(seed)
+        self.calls: Dict[str, int] = defaultdict(int)
+
+    def delay(self) -> float:
+        return max(self.latency + self.rnd.uniform(-self.jitter, self.jitter), 0.0)
+
+    def failed(self) -> bool:
+        return self.rnd.random() < self.error_rate
+
+
+class FakeUpstreams(Upstream):
+    # Один сервер отвечает за OpenWeatherMap, OpenFoodFacts и api-ninjas
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.app = web.Application()
+        self.app.router.add_get("/data/2.5/weather", self.weather)
+        self.app.router.add_get("/cgi/search.pl", self.food)
+        self.app.router.add_get("/v1/caloriesburned", self.workout)
+
+    async def respond(self, name: str, payload: Any) -> web.Response:
+        self.calls[name] += 1
+        await asyncio.sleep(self.delay())
+        if self.failed():
+            return web.json_response({"error": "fake failure"}, status=500)
+        return web.json_response(payload)
+
+    async def weather(self, request: web.Request) -> web.Response:
+        return await self.respond("weather", {"main": {"temp": round(self.rnd.uniform(-10, 35), 1)}})
+
+    async def food(self, request: web.Request) -> web.Response:
+        return await self.respond("nutrition", {
+            "products": [{"nutriments": {"energy-kcal_100g": round(self.rnd.uniform(30, 600), 1)}}]
+        })
+
+    async def workout(self, request: web.Request) -> web.Response:
+        return await self.respond("workout", [{
+            "name": request.query.get("activity", "workout"),
+            "calories_per_hour": round(self.rnd.uniform(200, 900)),
+        }])
+
+
+class FakeTranslator(Upstream):
+    # googletrans вызывается синхронно из пула потоков, поэтому и задержка синхронная
+    def translate(self, text: str, src: str, dest: str) -> SimpleNamespace:
+        self.calls["translation"] += 1
+        time.sleep(self.delay())
+        if self.failed():
+            raise RuntimeError("fake translation failure")
+        return SimpleNamespace(text=text)
+
+
+class SlowTelegramApi(FakeTelegramApi):
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    async def handle(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.latency)
+        return await super().handle(request)
+
+
+async def start_server(app: web.Application) -> Tuple[web.AppRunner, str]:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host="127.0.0.1", port=0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+def percentiles(values: List[float]) -> str:
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return f"p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  p99 {p99:7.1f} ms"
+
+
+async def run(args: argparse.Namespace):
+    upstream_args = (args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.seed)
+    upstreams = FakeUpstreams(*upstream_args)
+    translator = FakeTranslator(*upstream_args)
+    telegram = SlowTelegramApi(args.telegram_latency_ms / 1000)
+
+    telegram_runner, telegram_url = await start_server(telegram.app)
+    upstream_runner, upstream_url = await start_server(upstreams.app)
+
+    tmp = tempfile.TemporaryDirectory()
+    # Настройки читаются при импорте, поэтому окружение готовим до загрузки бота
+    defaults = {
+        "TOKEN_BOT": "123456:fake-token",
+        "API_KEY_OPEN_WEATHER": "fake",
+        "API_KEY_NUTRITION_TRAINING": "fake",
+        "DB_PATH": str(Path(tmp.name) / "fitness.db"),
+        "FOOD_INDEX_PATH": str(Path(tmp.name) / "missing_food_index.db"),
+        "RATE_LIMIT_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+    os.environ.update({
+        "TELEGRAM_API_URL": telegram_url,
+        "OPEN_WEATHER_URL": upstream_url,
+        "OPEN_FOOD_FACTS_URL": upstream_url,
+        "API_NINJAS_URL": upstream_url,
+    })
+
+    bot_main = importlib.import_module("main")
+    translation_service = importlib.import_module("app.services.translation_service")
+    translation_service.get_translator = lambda: translator
+    await bot_main.setup()
+    bot, dp = bot_main.bot, bot_main.dp
+
+    flow_times: Dict[str, List[float]] = defaultdict(list)
+    flow_errors: Dict[str, int] = defaultdict(int)
+    updates = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    activities = [name for name in ACTIVITY_WEIGHTS if name in args.flows]
+    weights = [ACTIVITY_WEIGHTS[name] for name in activities]
+
+    async def run_flow(user_id: int, name: str, rnd: random.Random):
+        nonlocal updates
+        elapsed = 0.0
+        try:
+            for kind, payload in FLOWS[name](rnd):
+                update = (
+                    make_message_update(user_id, payload) if kind == "message"
+                    else make_callback_update(user_id, payload)
+                )
+                started = time.perf_counter()
+                await dp.feed_raw_update(bot, update)
+                elapsed += time.perf_counter() - started
+                updates += 1
+        except Exception:
+            flow_errors[name] += 1
+            return
+        flow_times[name].append(elapsed)
+
+    async def simulate_user(index: int):
+        rnd = random.Random(args.seed * 1_000_003 + index)
+        user_id = 1_000_000 + index
+        async with semaphore:
+            await run_flow(user_id, "profile", rnd)
+            for _ in range(args.rounds if activities else 0):
+                await run_flow(user_id, rnd.choices(activities, weights)[0], rnd)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate_user(index) for index in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    await dp.emit_shutdown(bot=bot)
+    await bot.session.close()
+    await telegram_runner.cleanup()
+    await upstream_runner.cleanup()
+    tmp.cleanup()
+
+    flows = sum(len(times) for times in flow_times.values())
+    print(
+        f"users {args.users}, concurrency {args.concurrency}, upstream latency {args.latency_ms:.0f}±"
+        f"{args.jitter_ms:.0f} ms, error rate {args.error_rate:.0%}, telegram latency {args.telegram_latency_ms:.0f} ms"
+    )
+    print(f"total: {flows} flows, {updates} updates in {elapsed:.2f}s "
+          f"({flows / elapsed:.1f} flows/s, {updates / elapsed:.1f} updates/s)")
+    for name in FLOWS:
+        times = flow_times.get(name)
+        if times or flow_errors.get(name):
+            line = f"{name:>9}: {len(times or []):6d} ok {flow_errors.get(name, 0):4d} failed"
+            print(f"{line}  {percentiles(times)}" if times else line)
+    print(f"upstream calls: {dict(upstreams.calls) | dict(translator.calls)}")
+    print(f"telegram calls: {dict(telegram.calls)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against fake Telegram and fake upstreams")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="Users simulated at the same time")
+    parser.add_argument("--rounds", type=int, default=5, help="Activity flows per user after profile creation")
+    parser.add_argument("--flows", default=",".join(ACTIVITY_WEIGHTS), help="Comma-separated activity flows to mix")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean latency of fake upstreams")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of failing upstream calls")
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    args.flows = set(args.flows.split(","))
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
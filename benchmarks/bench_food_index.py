@@ -0,0 +1,87 @@
+import argparse
+import gc
+import gzip
+import json
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.food_index import FoodIndex, build_food_index  # noqa: E402
+
+
+RU_WORDS = ["яблоко", "молоко", "хлеб", "сыр", "курица", "гречка", "рис", "банан", "йогурт", "творог",
+            "шоколад", "печенье", "сок", "кефир", "масло", "колбаса", "овсянка", "макароны", "картофель", "мёд"]
+EN_WORDS = ["apple", "milk", "bread", "cheese", "chicken", "buckwheat", "rice", "banana", "yogurt", "cottage",
+            "chocolate", "cookies", "juice", "kefir", "butter", "sausage", "oatmeal", "pasta", "potato", "honey"]
+BRANDS = [f"brand{i}" for i in range(5000)]
+
+
+def generate_dump(path: Path, products: int, seed: int = 42):
+    rnd = random.Random(seed)
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=1) as f:
+        for i in range(products):
+            word = rnd.randrange(len(RU_WORDS))
+            brand = rnd.choice(BRANDS)
+            product = {
+                "code": str(i),
+                "product_name": f"{EN_WORDS[word]} {brand} {i % 997}",
+                "product_name_ru": f"{RU_WORDS[word]} {brand} {i % 991}",
+                "nutriments": {"energy-kcal_100g": rnd.uniform(10, 600)}
+            }
+            f.write(json.dumps(product, ensure_ascii=False))
+            f.write("\n")
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        return max_rss_mb()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = Path(tmp) / "products.jsonl.gz"
+        index_path = Path(tmp) / "food_index.db"
+
+        started = time.perf_counter()
+        generate_dump(dump, args.products)
+        print(f"dump: {args.products} products, {dump.stat().st_size / 2**20:.1f} MiB, "
+              f"{time.perf_counter() - started:.1f}s")
+
+        stats = build_food_index(dump, index_path)
+        print(f"build: {stats['records']} records -> {stats['names']} names in {stats['seconds']:.1f}s, "
+              f"file {index_path.stat().st_size / 2**20:.1f} MiB, max rss {max_rss_mb():.0f} MiB")
+
+        gc.collect()
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        index = FoodIndex.load(index_path)
+        print(f"load: {len(index)} names in {time.perf_counter() - started:.1f}s, "
+              f"index rss +{rss_mb() - rss_before:.0f} MiB")
+
+        queries = RU_WORDS + EN_WORDS + [f"{w} brand17" for w in RU_WORDS] + ["несуществующий продукт"]
+        started = time.perf_counter()
+        for i in range(args.lookups):
+            index.lookup(queries[i % len(queries)])
+        elapsed = time.perf_counter() - started
+        print(f"lookup: {elapsed / args.lookups * 1e6:.1f} us/op over {args.lookups} lookups")
+
+
+if __name__ == "__main__":
+    main()
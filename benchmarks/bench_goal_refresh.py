@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+for name, value in {
+    "TOKEN_BOT": "123456:fake-token",
+    "API_KEY_OPEN_WEATHER": "fake",
+    "API_KEY_NUTRITION_TRAINING": "fake",
+    "LOG_LEVEL": "WARNING",
+}.items():
+    os.environ.setdefault(name, value)
+
+from aiohttp import web  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+from app.db.db import Base  # noqa: E402
+from app.models.user import User  # noqa: E402, F401
+from app.services.goal_refresh import refresh_goals  # noqa: E402
+from app.services.goals import calculate_water_goal, calculate_calorie_goal  # noqa: E402
+from app.services.http_client import http_client  # noqa: E402
+from app.services.upstream_limits import UpstreamThrottled, upstream_limits  # noqa: E402
+from app.services.weather_service import WeatherService  # noqa: E402
+from app.settings.config import config  # noqa: E402
+
+
+def populate(path: Path, users: int, cities: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+
+    rnd = random.Random(1)
+    city_names = [f"Город {i}" for i in range(cities)]
+
+    def generate():
+        for user_id in range(1, users + 1):
+            yield (
+                user_id, rnd.uniform(45, 120), rnd.uniform(150, 200), rnd.randint(16, 80),
+                rnd.choice(city_names), rnd.randint(0, 180), 2000.0, 2000.0
+            )
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (user_id, weight, height, age, city, activity, water_level, calorie_level) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            list(generate())
+        )
+    return engine
+
+
+def fake_temperature(city: str) -> float:
+    return zlib.crc32(city.encode()) % 40 - 5
+
+
+async def start_weather_server(latency: float) -> Tuple[web.AppRunner, str]:
+    # Заглушка OpenWeatherMap: пересчёт идёт через настоящий WeatherService, кэш и лимиты
+    async def weather(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        return web.json_response({"main": {"temp": fake_temperature(request.query["q"])}})
+
+    app = web.Application()
+    app.router.add_get("/data/2.5/weather", weather)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host="127.0.0.1", port=0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+async def probe_interactive(interval: float, results: list):
+    # Пользовательские запросы погоды во время пересчёта: каждый раз новый город, мимо кэша
+    service = WeatherService()
+    number = 0
+    while True:
+        await asyncio.sleep(interval)
+        number += 1
+        try:
+            results.append(await service.get_temperature(f"Интерактивный город {number}"))
+        except UpstreamThrottled:
+            results.append(None)
+
+
+def refresh_row_by_row(engine, limit: int) -> float:
+    # Прежний подход: каждая строка считается и обновляется по отдельности
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT user_id, weight, height, age, COALESCE(activity, 0), city FROM users LIMIT ?", (limit,)
+        ).fetchall()
+        for user_id, weight, height, age, activity, city in rows:
+            data = {"weight": weight, "height": height, "age": age, "activity": activity}
+            conn.exec_driver_sql(
+                "UPDATE users SET water_level = ?, calorie_level = ? WHERE user_id = ?",
+                (calculate_water_goal(data, fake_temperature(city)), calculate_calorie_goal(data), user_id)
+            )
+    return time.perf_counter() - started
+
+
+async def run(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "users.db"
+
+        started = time.perf_counter()
+        engine = populate(path, args.users, args.cities)
+        print(f"populate: {args.users} users in {args.cities} cities, {time.perf_counter() - started:.1f}s, "
+              f"{path.stat().st_size / 2**20:.0f} MiB")
+
+        runner: Optional[web.AppRunner] = None
+        load_temperature = None
+        if args.real_weather:
+            runner, config.open_weather_url = await start_weather_server(args.weather_latency_ms / 1000)
+        else:
+            async def load_temperature(city: str) -> float:
+                await asyncio.sleep(args.weather_latency_ms / 1000)
+                return fake_temperature(city)
+
+        for run_number in (1, 2):
+            interactive: list = []
+            probe = asyncio.create_task(probe_interactive(args.probe_interval, interactive)) if runner else None
+            started = time.perf_counter()
+            stats = await refresh_goals(
+                load_temperature,
+                sync_engine=engine,
+                chunk_size=args.chunk_size,
+                concurrency=args.weather_concurrency
+            )
+            print(
+                f"vectorized run {run_number}: {stats['users']} users, {stats['changed']} changed in "
+                f"{time.perf_counter() - started:.2f}s (load {stats['load_seconds']:.2f}s, "
+                f"weather {stats['weather_seconds']:.2f}s, compute+write {stats['write_seconds']:.2f}s)"
+            )
+            if probe is not None:
+                probe.cancel()
+                answered = sum(temperature is not None for temperature in interactive)
+                limits = {name: upstream_limits.stats[name] for name in ("weather", "weather_background")}
+                print(f"  interactive lookups during the run: {answered}/{len(interactive)} answered, limits {limits}")
+
+        if runner is not None:
+            await http_client.close()
+            await runner.cleanup()
+
+        sample = min(args.baseline_users, args.users)
+        elapsed = refresh_row_by_row(engine, sample)
+        print(f"row-by-row: {sample} users in {elapsed:.2f}s, "
+              f"~{elapsed / sample * args.users:.0f}s extrapolated to {args.users} users")
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--weather-latency-ms", type=float, default=50.0)
+    parser.add_argument("--weather-concurrency", type=int, default=50)
+    parser.add_argument("--baseline-users", type=int, default=50000)
+    parser.add_argument("--real-weather", action="store_true",
+                        help="Fetch temperatures through WeatherService from a local fake OpenWeatherMap")
+    parser.add_argument("--probe-interval", type=float, default=1.5,
+                        help="Seconds between interactive weather lookups measured during a --real-weather run")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,149 @@
 import asyncio
+import sys
 
-from aiogram import Bot, Dispatcher
+from app.utils.startup_profile import startup_profiler
 
-from app.handlers.v1.user_logic_handlers import router as router_user_logic_v1
-from app.handlers.v1.activities_handlers import router as router_activities_v1
-from app.settings.config import config
-from app.db.db import engine, Base
-from app.settings.logging import UserActionLoggerMiddleware
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+if PROFILE_STARTUP:
+    startup_profiler.install_import_hook()
 
+from aiogram import Bot, Dispatcher  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
 
-bot = Bot(token=config.token_bot.get_secret_value())
-dp = Dispatcher()
+from app.handlers.v1.user_logic_handlers import router as router_user_logic_v1  # noqa: E402
+from app.handlers.v1.activities_handlers import router as router_activities_v1  # noqa: E402
+from app.handlers.v1.admin_handlers import router as router_admin_v1  # noqa: E402
+from app.settings.config import config  # noqa: E402
+from app.db.db import init_db, async_engine  # noqa: E402
+from app.db.fsm_storage import SQLiteStorage  # noqa: E402
+from app.settings.logging import UserActionLoggerMiddleware  # noqa: E402
+from app.settings.concurrency import ConcurrencyLimitMiddleware  # noqa: E402
+from app.settings.rate_limit import RateLimitMiddleware  # noqa: E402
+from app.settings.metrics import MetricsMiddleware, register_default_collectors  # noqa: E402
+from app.services.http_client import http_client  # noqa: E402
+from app.services.translation_service import warm_translation_cache  # noqa: E402
+from app.services.nutrition_cal_service import load_food_index  # noqa: E402
+from app.services.chart_service import chart_service  # noqa: E402
+from app.services.activity_log import activity_logger  # noqa: E402
+from app.services.goal_refresh import GoalRefreshScheduler  # noqa: E402
+from app.services.prewarm import start_prewarm, stop_prewarm  # noqa: E402
 
+if PROFILE_STARTUP:
+    startup_profiler.uninstall_import_hook()
 
-async def main():
-    Base.metadata.create_all(bind=engine)
 
-    user_action_logger = UserActionLoggerMiddleware()
-    dp.message.middleware(user_action_logger)  # Применяем middleware к сообщениям
+with startup_profiler.phase("bot and dispatcher"):
+    bot = Bot(
+        token=config.token_bot.get_secret_value(),
+        session=AiohttpSession(api=TelegramAPIServer.from_base(config.telegram_api_url))
+        if config.telegram_api_url else None
+    )
+    dp = Dispatcher(
+        storage=SQLiteStorage(
+            flush_delay=config.fsm_flush_delay,
+            cache_size=config.fsm_cache_size,
+            cache_ttl=config.fsm_cache_ttl
+        ) if config.fsm_storage == "sqlite" else None
+    )
+
 
+def include_routers():
+    dp.include_router(router_admin_v1)
     dp.include_router(router_user_logic_v1)
     dp.include_router(router_activities_v1)
 
-    await dp.start_polling(bot)
+
+async def supervise():
+    from app.server.supervisor import run_supervisor
+
+    # Миграции выполняем один раз до запуска воркеров, чтобы они не гонялись друг с другом
+    await init_db()
+    await async_engine.dispose()
+    include_routers()
+    await run_supervisor(__file__, dp.resolve_used_update_types())
+    await bot.session.close()
+
+
+async def setup() -> ConcurrencyLimitMiddleware:
+    with startup_profiler.phase("init_db"):
+        await init_db()
+
+    if config.prewarm_enabled:
+        # Кэш переводов, индекс продуктов, numpy и процессы графиков догружаются фоном
+        dp.startup.register(start_prewarm)
+        dp.shutdown.register(stop_prewarm)
+    else:
+        with startup_profiler.phase("translation cache and food index"):
+            await warm_translation_cache()
+            await load_food_index()
+
+    limiter = ConcurrencyLimitMiddleware(config.max_concurrent_updates)
+    dp.update.outer_middleware(limiter)
+
+    rate_limiter = None
+    if config.rate_limit_enabled:
+        rate_limiter = RateLimitMiddleware(
+            rate=config.rate_limit_user_rate,
+            burst=config.rate_limit_user_burst,
+            maxsize=config.rate_limit_user_keys
+        )
+        dp.message.outer_middleware(rate_limiter)
+        dp.callback_query.outer_middleware(rate_limiter)
+
+    user_action_logger = UserActionLoggerMiddleware(sample_rate=config.log_message_sample_rate)
+    dp.message.middleware(user_action_logger)  # Применяем middleware к сообщениям
+    dp.callback_query.middleware(user_action_logger)
+
+    metrics_middleware = MetricsMiddleware()
+    dp.message.middleware(metrics_middleware)
+    dp.callback_query.middleware(metrics_middleware)
+    register_default_collectors(limiter, rate_limiter, dp.storage)
+
+    include_routers()
+
+    dp.startup.register(activity_logger.start)
+    dp.shutdown.register(activity_logger.close)
+    dp.shutdown.register(http_client.close)
+    dp.shutdown.register(async_engine.dispose)
+    dp.shutdown.register(chart_service.close)
+
+    if config.goal_refresh_enabled:
+        goal_refresh = GoalRefreshScheduler(
+            at=config.goal_refresh_time,
+            chunk_size=config.goal_refresh_chunk_size,
+            concurrency=config.goal_refresh_concurrency
+        )
+        goal_refresh.start()
+        dp.shutdown.register(goal_refresh.close)
+
+    if config.metrics_port:
+        from app.server.metrics import start_metrics_server
+        metrics_runner = await start_metrics_server(config.metrics_host, config.metrics_port)
+        dp.shutdown.register(metrics_runner.cleanup)
+
+    return limiter
+
+
+async def main():
+    if config.workers > 1 and config.worker_index is None:
+        await supervise()
+        return
+
+    with startup_profiler.phase("setup total"):
+        limiter = await setup()
+
+    if PROFILE_STARTUP:
+        print(startup_profiler.report())
+        await dp.emit_shutdown()
+        await bot.session.close()
+        return
+
+    if config.bot_mode == "webhook":
+        from app.server.webhook import run_webhook
+        await run_webhook(bot, dp, limiter)
+    else:
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Настройки читаются при импорте app.settings.config, без ключей он не загрузится
+TEST_ENV = {
+    "TOKEN_BOT": "123456:test-token",
+    "API_KEY_OPEN_WEATHER": "test",
+    "API_KEY_NUTRITION_TRAINING": "test",
+    "LOG_LEVEL": "WARNING",
+}
+for name, value in TEST_ENV.items():
+    os.environ.setdefault(name, value)
+# Тесты, импортирующие app в своём процессе, работают с отдельной временной базой
+os.environ["DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="bot-tests-")) / "fitness.db")
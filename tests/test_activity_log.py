@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from conftest import ROOT, TEST_ENV
+
+
+USERS = 5
+WATER_LEVEL = 1500.0
+CALORIE_LEVEL = 800.0
+
+SETUP = textwrap.dedent("""
+    import asyncio
+    from sqlalchemy import text
+    from app.db.db import engine, init_db
+
+    asyncio.run(init_db())
+    with engine.begin() as conn:
+        for user_id in range(1, {users} + 1):
+            conn.execute(text(
+                "INSERT INTO users (user_id, weight, height, age, city, activity, water_level, calorie_level) "
+                "VALUES (:user_id, 70, 175, 30, 'Москва', 30, {water_level}, {calorie_level})"
+            ), {{"user_id": user_id}})
+""")
+
+# Каждый процесс — отдельный воркер со своим ActivityLogger поверх общего файла базы
+WORKER = textwrap.dedent("""
+    import asyncio
+    import json
+    import sys
+
+    from app.db.activity_events import EVENT_WATER, EVENT_FOOD, EVENT_WORKOUT
+    from app.services.activity_log import ActivityLogger
+    from app.services.profile_cache import get_profile
+
+    write_behind, seed, events = sys.argv[1] == "write_behind", int(sys.argv[2]), int(sys.argv[3])
+
+    async def main():
+        logger = ActivityLogger(write_behind=write_behind, flush_interval=0.01, flush_max_events=1, batch_size=50)
+        users = [await get_profile(user_id) for user_id in range(1, {users} + 1)]
+        errors = []
+
+        async def log(number):
+            user = users[(seed + number) % len(users)]
+            kind = number % 3
+            try:
+                if kind == 0:
+                    await logger.log(user, EVENT_WATER, water=250.0 + seed)
+                elif kind == 1:
+                    # 0 ккал — граничный случай: событие всё равно остаётся едой
+                    calories = float(number % 4) * 120
+                    await logger.log(user, EVENT_FOOD, calories=calories, food_name="еда", food_grams=100)
+                else:
+                    await logger.log(user, EVENT_WORKOUT, burned=90.0, workout_type="бег", workout_minutes=15)
+            except Exception as e:
+                errors.append(repr(e))
+
+        await asyncio.gather(*(log(number) for number in range(events)))
+        await logger.close()
+        print(json.dumps({{"errors": errors, "stats": logger.stats}}))
+
+    asyncio.run(main())
+""")
+
+
+def _env(db_path: Path) -> dict:
+    return {**os.environ, **TEST_ENV, "DB_PATH": str(db_path), "PYTHONPATH": str(ROOT)}
+
+
+def _run(script: str, db_path: Path, *args: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-c", script, *args],
+        env=_env(db_path),
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+
+
+@pytest.mark.parametrize("modes", [
+    ("write_behind", "write_behind"),
+    ("direct", "direct"),
+    ("write_behind", "direct"),
+])
+def test_two_loggers_share_one_database(tmp_path: Path, modes):
+    db_path = tmp_path / "fitness.db"
+    events = 300
+
+    setup = _run(SETUP.format(users=USERS, water_level=WATER_LEVEL, calorie_level=CALORIE_LEVEL), db_path)
+    _, stderr = setup.communicate(timeout=120)
+    assert setup.returncode == 0, stderr
+
+    script = WORKER.format(users=USERS)
+    workers = [_run(script, db_path, mode, str(seed), str(events)) for seed, mode in enumerate(modes)]
+    for worker in workers:
+        stdout, stderr = worker.communicate(timeout=300)
+        assert worker.returncode == 0, stderr
+        result = json.loads(stdout.strip().splitlines()[-1])
+        # Событие, уже записанное в журнал, не должно оборачиваться ошибкой для обработчика
+        assert result["errors"] == []
+        assert result["stats"]["pending_events"] == 0
+
+    with sqlite3.connect(db_path) as conn:
+        count, last_event_id = conn.execute("SELECT count(*), max(event_id) FROM activity_events").fetchone()
+        watermark = conn.execute(
+            "SELECT last_event_id FROM compaction_watermarks WHERE name = 'daily_data'"
+        ).fetchone()[0]
+        assert count == events * len(modes)
+        assert watermark == last_event_id
+
+        kinds = dict(conn.execute("SELECT kind, count(*) FROM activity_events GROUP BY kind").fetchall())
+        assert kinds == {"water": events * 2 // 3, "food": events * 2 // 3, "workout": events * 2 // 3}
+
+        # Свёрнутые дни совпадают с суммами событий журнала
+        mismatched = conn.execute("""
+            SELECT count(*)
+            FROM (
+                SELECT user_id, date(ts) AS day, sum(water) AS water, sum(calories) AS calories, sum(burned) AS burned
+                FROM activity_events GROUP BY user_id, date(ts)
+            ) AS events
+            LEFT JOIN daily_data ON daily_data.user_id = events.user_id AND daily_data.date = events.day
+            WHERE abs(coalesce(daily_data.logged_water, 0) - events.water) > 1e-6
+               OR abs(coalesce(daily_data.logged_calories, 0) - events.calories) > 1e-6
+               OR abs(coalesce(daily_data.burned_calories, 0) - events.burned) > 1e-6
+        """).fetchone()[0]
+        assert mismatched == 0
+
+        days = conn.execute("""
+            SELECT user_id, sum(logged_water), sum(logged_calories), sum(burned_calories), count(*),
+                   sum(logged_water >= ?), sum(logged_calories >= ?)
+            FROM daily_data GROUP BY user_id ORDER BY user_id
+        """, (WATER_LEVEL, CALORIE_LEVEL)).fetchall()
+        for table in ("weekly_rollups", "monthly_rollups"):
+            rollups = conn.execute(f"""
+                SELECT user_id, sum(water_sum), sum(calories_sum), sum(burned_sum), sum(days_logged),
+                       sum(water_goal_days), sum(calorie_goal_days)
+                FROM {table} GROUP BY user_id ORDER BY user_id
+            """).fetchall()
+            assert rollups == [pytest.approx(row) for row in days], table
+
+
+def test_log_survives_lost_watermark_race(monkeypatch):
+    from sqlalchemy import text
+
+    from app.db.activity_events import EVENT_WATER
+    from app.db.db import engine, init_db
+    from app.services import activity_log
+    from app.services.activity_log import STALE_RETRIES, ActivityLogger
+    from app.services.profile_cache import get_profile
+
+    async def lost_race(*args, **kwargs) -> bool:
+        # Отметку каждый раз успевает сдвинуть «другой воркер»
+        return False
+
+    async def scenario():
+        await init_db()
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO users (user_id, weight, height, age, city, activity, water_level, calorie_level) "
+                "VALUES (100, 70, 175, 30, 'Москва', 30, 1500, 800)"
+            ))
+        user = await get_profile(100)
+        logger = ActivityLogger(write_behind=True, flush_interval=60, flush_max_events=1, batch_size=50)
+
+        monkeypatch.setattr(activity_log, "advance_watermark", lost_race)
+        totals = await logger.log(user, EVENT_WATER, water=300.0)
+        assert totals.logged_water == 300.0
+        assert logger.stats["stale_compactions"] == STALE_RETRIES
+        assert logger.stats["pending_events"] == 1
+
+        # Гонка закончилась: следующая компакция сворачивает событие, записанное раньше
+        monkeypatch.undo()
+        await logger.close()
+        assert logger.stats["pending_events"] == 0
+        with engine.connect() as conn:
+            water = conn.execute(text("SELECT logged_water FROM daily_data WHERE user_id = 100")).scalar_one()
+        assert water == 300.0
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import pytest
+
+from app.utils import token_bucket
+from app.utils.token_bucket import KeyedRateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(token_bucket.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_burst_then_refills_at_rate(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert bucket.wait_time() == pytest.approx(0.5)
+
+    clock[0] += 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    # Простой не копит токены сверх burst
+    clock[0] += 60
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_keyed_limiter_isolates_keys_and_evicts_oldest(clock):
+    limiter = KeyedRateLimiter(rate=1.0, burst=1, maxsize=2)
+
+    assert limiter.try_acquire("a")
+    assert not limiter.try_acquire("a")
+    assert limiter.try_acquire("b")
+
+    limiter.try_acquire("c")
+    assert len(limiter) == 2
+    # Вытесненный ключ начинает с полной корзиной
+    assert limiter.try_acquire("a")
+    assert limiter.stats == {"keys": 2, "allowed": 4, "throttled": 1}
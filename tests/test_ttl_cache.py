@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.utils.ttl_cache import TTLCache
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(maxsize=10, ttl=60)
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load("key", load) for _ in range(20)))
+
+    assert asyncio.run(scenario()) == ["value"] * 20
+    assert calls == 1
+    assert (cache.misses, cache.coalesced) == (1, 19)
+    assert cache.get("key") == "value"
+
+
+def test_failed_load_reaches_every_waiter_and_is_not_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        if calls == 1:
+            raise RuntimeError("upstream failed")
+        return "value"
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_load("key", load) for _ in range(5)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert "key" not in cache
+        # Следующий запрос загружает значение заново
+        assert await cache.get_or_load("key", load) == "value"
+
+    asyncio.run(scenario())
+    assert calls == 2
+
+
+def test_invalidate_during_load_discards_stale_result():
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def load():
+            started.set()
+            await asyncio.sleep(0.01)
+            return "stale"
+
+        task = asyncio.create_task(cache.get_or_load("key", load))
+        await started.wait()
+        cache.invalidate("key")
+        assert await task == "stale"
+        assert "key" not in cache
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("cache_none, cached", [(False, False), (True, True)])
+def test_none_is_cached_only_on_request(cache_none, cached):
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    async def load():
+        return None
+
+    asyncio.run(cache.get_or_load("key", load, cache_none=cache_none))
+    assert ("key" in cache) is cached